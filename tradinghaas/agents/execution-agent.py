@@ -5,7 +5,6 @@ from datetime import datetime, timedelta
 from enum import Enum
 from typing import Dict, List, Optional, Tuple
 import numpy as np
-from collections import deque
 
 class OrderType(Enum):
     MARKET = "MARKET"
@@ -51,6 +50,13 @@ class OrderUpdate:
     remaining_quantity: float
     metadata: Dict
 
+@dataclass
+class MarketSnapshot:
+    volatility: float
+    liquidity: float
+    spread: float
+    avg_volume: float
+
 class ExecutionAgent:
     """
     Execution Agent for optimal trade execution and order management.
@@ -64,23 +70,52 @@ class ExecutionAgent:
         self.max_slippage = 0.001  # 10 basis points
         self.min_fill_rate = 0.95  # 95% minimum fill rate
         self.max_spread = 0.002  # 20 basis points maximum spread
+        self.broker_timeout = 5.0  # Seconds allowed per broker round-trip
         
         # Order Management
         self.active_orders = {}
         self.order_history = {}
         self.fill_statistics = {}
+        self.unknown_orders = []  # Placements that timed out, awaiting broker reconciliation
         
-        # Performance Tracking
+        # Performance Tracking (fixed-size ring buffers sharing one write head)
+        self.metrics_capacity = 1000
         self.execution_metrics = {
-            'slippage': deque(maxlen=1000),
-            'fill_rates': deque(maxlen=1000),
-            'execution_times': deque(maxlen=1000)
+            'slippage': np.zeros(self.metrics_capacity),
+            'fill_rates': np.zeros(self.metrics_capacity),
+            'execution_times': np.zeros(self.metrics_capacity)
         }
+        self.metrics_head = 0
+        self.metrics_count = 0
         
         # Market Impact Parameters
         self.impact_threshold = 0.1  # 10% of average volume
         self.spread_multiplier = 1.5
         
+        # Strategy Scoring
+        # Rows follow execution_strategies; columns weight
+        # [normalized volatility, normalized depth, normalized spread, participation, bias].
+        # Depth (book liquidity) and participation (order quantity) are both measured
+        # against impact_threshold of average daily volume, so 1.0 means 10% of ADV.
+        self.execution_strategies = (
+            ExecutionStrategy.AGGRESSIVE,
+            ExecutionStrategy.PASSIVE,
+            ExecutionStrategy.SMART,
+            ExecutionStrategy.VWAP,
+            ExecutionStrategy.TWAP
+        )
+        self.strategy_weights = np.array([
+            [-0.5,  1.0, -1.0, -1.0, 0.0],  # AGGRESSIVE: small orders in deep, tight markets
+            [-1.0,  0.0,  1.0, -0.5, 0.0],  # PASSIVE: small orders in calm markets, wide spreads
+            [ 0.0,  0.0,  0.0,  0.0, 0.5],  # SMART: neutral baseline
+            [ 0.5, -1.0,  0.0,  1.0, 0.0],  # VWAP: large orders in thin books
+            [ 0.5, -0.5,  0.0,  0.5, 0.0]   # TWAP: moderately large orders or thin books
+        ])
+        
+        # Scheduled Execution Parameters
+        self.schedule_buckets = 12  # Child orders per VWAP/TWAP schedule
+        self.schedule_profiles = {}  # Cumulative weight profiles by (strategy, buckets)
+        
     async def initialize(self) -> bool:
         """Initialize the Execution Agent."""
         try:
@@ -107,19 +142,28 @@ class ExecutionAgent:
             if not await self._validate_order(request):
                 return False, "Order validation failed"
             
+            # Fetch market conditions once for this order
+            snapshot = await self._get_market_snapshot(request.symbol)
+            
             # Select execution strategy
-            strategy = await self._select_execution_strategy(request)
+            strategy = await self._select_execution_strategy(request, snapshot)
             
             # Estimate market impact
-            impact = await self._estimate_market_impact(request)
+            impact = await self._estimate_market_impact(request, snapshot)
             if impact > self.impact_threshold:
                 request = await self._adjust_for_impact(request, impact)
             
             # Generate order parameters
             order_params = await self._generate_order_parameters(request, strategy)
             
-            # Place order
-            order_id = await self._place_order(order_params)
+            # Place order; on timeout the broker may still have accepted it
+            try:
+                async with asyncio.timeout(self.broker_timeout):
+                    order_id = await self._place_order(order_params)
+            except TimeoutError:
+                self.unknown_orders.append(order_params)
+                self.logger.error(f"Order placement timed out for {request.symbol}; status unknown")
+                return False, "Order placement timed out"
             if not order_id:
                 return False, "Order placement failed"
             
@@ -139,53 +183,59 @@ class ExecutionAgent:
                 raise ValueError(f"Order {order_id} not found")
             
             # Get order status
-            status = await self._get_order_status(order_id)
-            
-            # Update execution metrics
-            await self._update_execution_metrics(order_id, status)
+            async with asyncio.timeout(self.broker_timeout):
+                status = await self._get_order_status(order_id)
             
             # Check for execution quality issues
             if await self._check_execution_issues(order_id, status):
                 await self._handle_execution_issues(order_id)
             
+            # Update execution metrics without losing the status on failure
+            try:
+                await self._update_execution_metrics(order_id, status)
+            except Exception as e:
+                self.logger.error(f"Execution metrics update failed for order {order_id}: {str(e)}")
+            
             return status
             
+        except TimeoutError:
+            self.logger.error(f"Status request for order {order_id} timed out after {self.broker_timeout}s")
+            return None
+            
         except Exception as e:
             self.logger.error(f"Order monitoring failed: {str(e)}")
             return None
 
-    async def _select_execution_strategy(self, request: OrderRequest) -> ExecutionStrategy:
+    async def _get_market_snapshot(self, symbol: str) -> MarketSnapshot:
+        """Fetch the market conditions used for order routing concurrently."""
+        volatility, liquidity, spread, avg_volume = await asyncio.gather(
+            self._get_market_volatility(symbol),
+            self._get_market_liquidity(symbol),
+            self._get_market_spread(symbol),
+            self._get_average_volume(symbol)
+        )
+        return MarketSnapshot(
+            volatility=volatility,
+            liquidity=liquidity,
+            spread=spread,
+            avg_volume=avg_volume
+        )
+
+    async def _select_execution_strategy(self, request: OrderRequest,
+                                       snapshot: MarketSnapshot) -> ExecutionStrategy:
         """Select optimal execution strategy based on order and market conditions."""
-        try:
-            # Get market conditions
-            volatility = await self._get_market_volatility(request.symbol)
-            liquidity = await self._get_market_liquidity(request.symbol)
-            spread = await self._get_market_spread(request.symbol)
-            
-            # Calculate strategy scores
-            scores = {
-                ExecutionStrategy.AGGRESSIVE: self._score_aggressive_strategy(
-                    request, volatility, liquidity, spread
-                ),
-                ExecutionStrategy.PASSIVE: self._score_passive_strategy(
-                    request, volatility, liquidity, spread
-                ),
-                ExecutionStrategy.SMART: self._score_smart_strategy(
-                    request, volatility, liquidity, spread
-                ),
-                ExecutionStrategy.VWAP: self._score_vwap_strategy(
-                    request, volatility, liquidity, spread
-                ),
-                ExecutionStrategy.TWAP: self._score_twap_strategy(
-                    request, volatility, liquidity, spread
-                )
-            }
-            
-            return max(scores.items(), key=lambda x: x[1])[0]
-            
-        except Exception as e:
-            self.logger.error(f"Strategy selection failed: {str(e)}")
-            return ExecutionStrategy.SMART
+        # Score every strategy in one pass
+        adv_scale = max(snapshot.avg_volume, 1.0) * self.impact_threshold
+        features = np.array([
+            snapshot.volatility / 0.2,  # Normalized to 20% volatility
+            snapshot.liquidity / adv_scale,
+            snapshot.spread / self.max_spread,
+            request.quantity / adv_scale,
+            1.0
+        ])
+        scores = self.strategy_weights @ features
+        
+        return self.execution_strategies[int(scores.argmax())]
 
     async def _generate_order_parameters(self, request: OrderRequest, 
                                       strategy: ExecutionStrategy) -> Dict:
@@ -214,37 +264,69 @@ class ExecutionAgent:
             self.logger.error(f"Order parameter generation failed: {str(e)}")
             return None
 
-    async def _estimate_market_impact(self, request: OrderRequest) -> float:
+    async def _generate_vwap_params(self, base_params: Dict, request: OrderRequest) -> Dict:
+        """Split the order into child slices following the intraday volume profile."""
+        profile = self._get_schedule_profile(ExecutionStrategy.VWAP, self.schedule_buckets)
+        return {
+            **base_params,
+            'strategy': ExecutionStrategy.VWAP,
+            'child_quantities': self._allocate_schedule(request.quantity, profile).tolist()
+        }
+
+    async def _generate_twap_params(self, base_params: Dict, request: OrderRequest) -> Dict:
+        """Split the order into equal child slices over the schedule horizon."""
+        profile = self._get_schedule_profile(ExecutionStrategy.TWAP, self.schedule_buckets)
+        return {
+            **base_params,
+            'strategy': ExecutionStrategy.TWAP,
+            'child_quantities': self._allocate_schedule(request.quantity, profile).tolist()
+        }
+
+    def _get_schedule_profile(self, strategy: ExecutionStrategy, n_buckets: int) -> np.ndarray:
+        """Return the cached cumulative weight profile for a scheduled strategy."""
+        key = (strategy, n_buckets)
+        profile = self.schedule_profiles.get(key)
+        if profile is None:
+            if strategy == ExecutionStrategy.VWAP:
+                # U-shaped intraday volume: heavier at the open and close
+                mid = (n_buckets - 1) / 2
+                weights = 1.0 + np.abs(np.arange(n_buckets) - mid)
+            else:
+                weights = np.ones(n_buckets)
+            profile = np.cumsum(weights / weights.sum())
+            profile[-1] = 1.0
+            self.schedule_profiles[key] = profile
+        return profile
+
+    def _allocate_schedule(self, quantity: float, profile: np.ndarray) -> np.ndarray:
+        """Round cumulative targets down and hand the remainder to the last slice."""
+        targets = np.floor(quantity * profile)
+        targets[-1] = quantity
+        return np.diff(targets, prepend=0.0)
+
+    async def _estimate_market_impact(self, request: OrderRequest,
+                                    snapshot: MarketSnapshot) -> float:
         """Estimate market impact of the order."""
-        try:
-            # Get market data
-            avg_volume = await self._get_average_volume(request.symbol)
-            volatility = await self._get_market_volatility(request.symbol)
-            spread = await self._get_market_spread(request.symbol)
-            
-            # Calculate impact factors
-            volume_factor = request.quantity / avg_volume
-            volatility_factor = volatility / 0.2  # Normalized to 20% volatility
-            spread_factor = spread / self.max_spread
-            
-            # Combine factors
-            impact = (
-                volume_factor * 0.5 +
-                volatility_factor * 0.3 +
-                spread_factor * 0.2
-            )
-            
-            return impact
-            
-        except Exception as e:
-            self.logger.error(f"Market impact estimation failed: {str(e)}")
-            return float('inf')
+        # Calculate impact factors
+        volume_factor = request.quantity / snapshot.avg_volume
+        volatility_factor = snapshot.volatility / 0.2  # Normalized to 20% volatility
+        spread_factor = snapshot.spread / self.max_spread
+        
+        # Combine factors
+        impact = (
+            volume_factor * 0.5 +
+            volatility_factor * 0.3 +
+            spread_factor * 0.2
+        )
+        
+        return impact
 
     async def _handle_execution_issues(self, order_id: str):
         """Handle execution quality issues."""
         try:
             order = self.active_orders[order_id]
-            status = await self._get_order_status(order_id)
+            async with asyncio.timeout(self.broker_timeout):
+                status = await self._get_order_status(order_id)
             
             if status.status == OrderStatus.PARTIALLY_FILLED:
                 if await self._should_adjust_order(order_id):
@@ -256,6 +338,10 @@ class ExecutionAgent:
                     
             await self._update_execution_statistics(order_id)
             
+        except TimeoutError:
+            # Logged here so monitor_order still returns the status it already fetched
+            self.logger.error(f"Broker timed out after {self.broker_timeout}s handling issues for order {order_id}")
+            
         except Exception as e:
             self.logger.error(f"Execution issue handling failed: {str(e)}")
 
@@ -270,9 +356,10 @@ class ExecutionAgent:
             new_quantity = await self._calculate_adjusted_quantity(order, market_data)
             
             # Update order
-            update_successful = await self._update_order(
-                order_id, new_price, new_quantity
-            )
+            async with asyncio.timeout(self.broker_timeout):
+                update_successful = await self._update_order(
+                    order_id, new_price, new_quantity
+                )
             
             if update_successful:
                 self.logger.info(f"Order {order_id} parameters adjusted successfully")
@@ -282,32 +369,35 @@ class ExecutionAgent:
 
     async def _update_execution_metrics(self, order_id: str, status: OrderUpdate):
         """Update execution quality metrics."""
-        try:
-            order = self.active_orders[order_id]
-            
-            # Calculate metrics
-            slippage = self._calculate_slippage(order, status)
-            fill_rate = status.filled_quantity / order.quantity
-            execution_time = (status.last_fill_time - order.submission_time).total_seconds()
-            
-            # Update metrics
-            self.execution_metrics['slippage'].append(slippage)
-            self.execution_metrics['fill_rates'].append(fill_rate)
-            self.execution_metrics['execution_times'].append(execution_time)
-            
-            # Log significant deviations
-            if slippage > self.max_slippage:
-                self.logger.warning(f"High slippage detected for order {order_id}: {slippage}")
-                
-        except Exception as e:
-            self.logger.error(f"Metrics update failed: {str(e)}")
+        order = self.active_orders[order_id]
+        
+        # Calculate metrics
+        slippage = self._calculate_slippage(order, status)
+        fill_rate = status.filled_quantity / order.quantity
+        execution_time = (status.last_fill_time - order.submission_time).total_seconds()
+        
+        # Update metrics
+        slot = self.metrics_head
+        self.execution_metrics['slippage'][slot] = slippage
+        self.execution_metrics['fill_rates'][slot] = fill_rate
+        self.execution_metrics['execution_times'][slot] = execution_time
+        self.metrics_head = (slot + 1) % self.metrics_capacity
+        self.metrics_count = min(self.metrics_count + 1, self.metrics_capacity)
+        
+        # Log significant deviations
+        if slippage > self.max_slippage:
+            self.logger.warning(f"High slippage detected for order {order_id}: {slippage}")
 
     async def shutdown(self):
         """Clean shutdown of the agent."""
         try:
             # Cancel all active orders
             for order_id in list(self.active_orders.keys()):
-                await self._cancel_order(order_id)
+                try:
+                    async with asyncio.timeout(self.broker_timeout):
+                        await self._cancel_order(order_id)
+                except TimeoutError:
+                    self.logger.error(f"Cancel timed out for order {order_id}")
             
             # Save execution statistics
             await self._save_execution_statistics()
@@ -1,11 +1,69 @@
+import os
+import re
 import asyncio
 import aiohttp
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 import logging
-from transformers import pipeline
-from collections import defaultdict
+from time import monotonic
+import onnxruntime as ort
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from optimum.onnxruntime import ORTModelForSequenceClassification
+import torch
+from transformers import AutoConfig, AutoTokenizer, pipeline
+from collections import OrderedDict, defaultdict, deque
+from hashlib import blake2b
+
+class QuantizedSentimentModel:
+    """
+    Sequence classifier exported to ONNX with int8 dynamic quantization.
+    Called like a transformers sentiment-analysis pipeline.
+    """
+    
+    def __init__(self, model_name: str, cache_dir: str, num_threads: int = 0):
+        # Export and quantize once, then reuse the cached int8 model
+        model_path = os.path.join(cache_dir, "model-int8.onnx")
+        if not os.path.exists(model_path):
+            ORTModelForSequenceClassification.from_pretrained(model_name, export=True).save_pretrained(cache_dir)
+            quantize_dynamic(os.path.join(cache_dir, "model.onnx"), model_path,
+                             weight_type=QuantType.QInt8)
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.labels = AutoConfig.from_pretrained(model_name).id2label
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        providers = ["CPUExecutionProvider"]
+        if "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(model_path, options, providers=providers)
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = 32,
+                 truncation: bool = True, max_length: int = 512) -> List[Dict]:
+        """Classify texts, returning the top label and its probability for each."""
+        if isinstance(texts, str):
+            texts = [texts]
+        
+        results = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True,
+                                    truncation=truncation, max_length=max_length, return_tensors="np")
+            logits = self.session.run(
+                None, {name: value for name, value in inputs.items() if name in self.input_names}
+            )[0]
+            
+            # Softmax over classes
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            best = probs.argmax(axis=1)
+            results.extend(
+                {'label': self.labels[int(label)], 'score': float(probs[i, label])}
+                for i, label in enumerate(best)
+            )
+        
+        return results
 
 class MediaAnalysisAgent:
     """
@@ -13,17 +71,24 @@ class MediaAnalysisAgent:
     Includes sentiment analysis, source credibility tracking, and signal generation.
     """
     
+    _WS_RE = re.compile(r'\s+')
+    
     def __init__(self):
         self.logger = logging.getLogger("MediaAnalysisAgent")
         # Sentiment analysis configuration
-        self.sentiment_model = pipeline("sentiment-analysis", model="ProsusAI/finbert")
+        self.sentiment_model = self._load_sentiment_model("ProsusAI/finbert")
+        self.sentiment_batch_size = 32
+        self.sentiment_cache = OrderedDict()  # text digest -> score, LRU order
+        self.sentiment_cache_size = 4096
         self.sentiment_threshold = 0.7
         self.momentum_threshold = 0.5
         
         # Source credibility tracking
         self.source_credibility = defaultdict(lambda: 0.5)  # Default credibility of 0.5
-        self.source_history = defaultdict(list)
         self.max_history_length = 1000
+        self.source_history = defaultdict(lambda: deque(maxlen=self.max_history_length))
+        self.credibility_window = 100
+        self.credibility_alpha = 2 / (self.credibility_window + 1)  # EWMA span of the window
         
         # Signal generation parameters
         self.signal_validity_period = timedelta(hours=4)
@@ -34,13 +99,32 @@ class MediaAnalysisAgent:
             'news_api': 100,  # requests per minute
             'social_api': 50   # requests per minute
         }
+        self.api_concurrency = {
+            'news_api': 8,  # requests in flight
+            'social_api': 4
+        }
         self.api_quotas = defaultdict(int)
+        self.api_calls = {api: deque() for api in self.rate_limits}  # monotonic call times
+        self.api_semaphores = {}
+        
+    def _load_sentiment_model(self, model_name: str):
+        """Load an fp16 pipeline on CUDA hosts, falling back to the ONNX int8 model on CPU."""
+        if torch.cuda.is_available():
+            return pipeline("sentiment-analysis", model=model_name, device=0,
+                            torch_dtype=torch.float16)
+        return QuantizedSentimentModel(
+            model_name, cache_dir=os.getenv("SENTIMENT_MODEL_DIR", "./models/finbert-onnx")
+        )
         
     async def initialize(self) -> bool:
         """Initialize the agent and required resources."""
         try:
-            # Initialize API connections
-            self.session = aiohttp.ClientSession()
+            # Initialize API connections with a pooled keep-alive connector
+            connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector)
+            self.api_semaphores = {
+                api: asyncio.Semaphore(limit) for api, limit in self.api_concurrency.items()
+            }
             
             # Load credibility history
             await self._load_credibility_history()
@@ -58,18 +142,31 @@ class MediaAnalysisAgent:
     async def process_news_batch(self, news_items: List[Dict]) -> List[Dict]:
         """Process a batch of news items and generate trading signals."""
         try:
-            # Group news by symbol
+            # Group news by symbol, keeping symbols with enough sources
             symbol_news = defaultdict(list)
             for item in news_items:
                 symbol_news[item['symbol']].append(item)
+            symbol_news = {
+                symbol: items for symbol, items in symbol_news.items()
+                if len(items) >= self.min_sources_required
+            }
+            if not symbol_news:
+                return []
             
-            # Process each symbol's news
+            # Score all qualifying items in one batched model call off the event loop
+            texts = [item['content'] for items in symbol_news.values() for item in items]
+            scores = await self._calculate_sentiments(texts)
+            
+            # Process each symbol's news with its slice of the scores, sharing one clock read
             signals = []
+            offset = 0
+            now = datetime.now()
             for symbol, items in symbol_news.items():
-                if len(items) >= self.min_sources_required:
-                    signal = await self._analyze_symbol_news(symbol, items)
-                    if signal:
-                        signals.append(signal)
+                signal = await self._analyze_symbol_news(symbol, items, scores[offset:offset + len(items)],
+                                                         now)
+                offset += len(items)
+                if signal:
+                    signals.append(signal)
             
             return signals
             
@@ -77,36 +174,37 @@ class MediaAnalysisAgent:
             self.logger.error(f"News batch processing failed: {str(e)}")
             return []
             
-    async def _analyze_symbol_news(self, symbol: str, news_items: List[Dict]) -> Optional[Dict]:
+    async def _analyze_symbol_news(self, symbol: str, news_items: List[Dict],
+                                   sentiment_scores: np.ndarray,
+                                   now: Optional[datetime] = None) -> Optional[Dict]:
         """Analyze news items for a specific symbol and generate a signal if warranted."""
         try:
+            now = now or datetime.now()
+            
             # Calculate weighted sentiments
-            weighted_sentiments = []
-            for item in news_items:
-                sentiment_score = await self._calculate_sentiment(item['content'])
-                source_weight = self.source_credibility[item['source']]
-                weighted_sentiments.append(sentiment_score * source_weight)
+            source_weights = np.fromiter((self.source_credibility[item['source']] for item in news_items),
+                                         dtype=np.float64, count=len(news_items))
+            weighted_sentiments = sentiment_scores * source_weights
             
             # Calculate aggregate sentiment
-            if weighted_sentiments:
-                avg_sentiment = np.mean(weighted_sentiments)
-                sentiment_std = np.std(weighted_sentiments)
-                
-                # Generate signal if sentiment is strong and consistent
-                if abs(avg_sentiment) > self.sentiment_threshold and sentiment_std < 0.3:
-                    return {
-                        'symbol': symbol,
-                        'timestamp': datetime.now(),
-                        'signal_type': 'LONG' if avg_sentiment > 0 else 'SHORT',
-                        'confidence': min(abs(avg_sentiment), 1.0),
-                        'source': 'media_analysis',
-                        'expiry': datetime.now() + self.signal_validity_period,
-                        'metadata': {
-                            'sentiment_score': avg_sentiment,
-                            'sentiment_std': sentiment_std,
-                            'num_sources': len(news_items)
-                        }
+            avg_sentiment = weighted_sentiments.mean()
+            sentiment_std = weighted_sentiments.std()
+            
+            # Generate signal if sentiment is strong and consistent
+            if abs(avg_sentiment) > self.sentiment_threshold and sentiment_std < 0.3:
+                return {
+                    'symbol': symbol,
+                    'timestamp': now,
+                    'signal_type': 'LONG' if avg_sentiment > 0 else 'SHORT',
+                    'confidence': min(abs(avg_sentiment), 1.0),
+                    'source': 'media_analysis',
+                    'expiry': now + self.signal_validity_period,
+                    'metadata': {
+                        'sentiment_score': avg_sentiment,
+                        'sentiment_std': sentiment_std,
+                        'num_sources': len(news_items)
                     }
+                }
             
             return None
             
@@ -114,56 +212,91 @@ class MediaAnalysisAgent:
             self.logger.error(f"Symbol news analysis failed for {symbol}: {str(e)}")
             return None
             
-    async def _calculate_sentiment(self, text: str) -> float:
-        """Calculate sentiment score for a piece of text."""
+    async def _calculate_sentiments(self, texts: List[str]) -> np.ndarray:
+        """Calculate sentiment scores (-1 to 1) for a batch of texts in one model call."""
         try:
-            # Preprocess text
-            cleaned_text = self._preprocess_text(text)
-            
-            # Get sentiment from model
-            result = self.sentiment_model(cleaned_text)[0]
-            
-            # Convert to normalized score (-1 to 1)
-            if result['label'] == 'positive':
-                return result['score']
-            elif result['label'] == 'negative':
-                return -result['score']
-            else:
-                return 0.0
+            # Dedupe by digest so recirculated headlines are scored once
+            keys = [blake2b(text.encode(), digest_size=16).digest() for text in texts]
+            pending = {}
+            for key, text in zip(keys, texts):
+                if key not in self.sentiment_cache and key not in pending:
+                    pending[key] = text
+            
+            if pending:
+                # Only the model runs in the worker thread; the cache is updated on the loop
+                scores = await asyncio.to_thread(self._score_texts, list(pending.values()))
+                self.sentiment_cache.update(zip(pending, scores.tolist()))
+            
+            # Map back to every occurrence, refreshing LRU order
+            for key in keys:
+                self.sentiment_cache.move_to_end(key)
+            sentiments = np.fromiter((self.sentiment_cache[key] for key in keys),
+                                     dtype=np.float64, count=len(keys))
+            while len(self.sentiment_cache) > self.sentiment_cache_size:
+                self.sentiment_cache.popitem(last=False)
+            return sentiments
                 
         except Exception as e:
             self.logger.error(f"Sentiment calculation failed: {str(e)}")
-            return 0.0
+            return np.zeros(len(texts))
+            
+    def _score_texts(self, texts: List[str]) -> np.ndarray:
+        """Run the sentiment model over texts, normalizing scores to -1 to 1."""
+        cleaned_texts = [self._preprocess_text(text) for text in texts]
+        results = self.sentiment_model(cleaned_texts, batch_size=self.sentiment_batch_size,
+                                       truncation=True, max_length=512)
+        labels = np.array([result['label'] for result in results])
+        scores = np.fromiter((result['score'] for result in results),
+                             dtype=np.float64, count=len(results))
+        return np.where(labels == 'positive', scores,
+                        np.where(labels == 'negative', -scores, 0.0))
             
     def _preprocess_text(self, text: str) -> str:
         """Clean and prepare text for sentiment analysis."""
-        # Basic cleaning
-        text = text.replace('\n', ' ').replace('\t', ' ')
-        text = ' '.join(text.split())  # Remove extra whitespace
-        
-        # Truncate if too long
-        max_length = 512  # Model's maximum sequence length
-        words = text.split()
-        if len(words) > max_length:
-            text = ' '.join(words[:max_length])
-            
-        return text
+        # Collapse whitespace; truncation to the model's 512 tokens is left to the tokenizer
+        return self._WS_RE.sub(' ', text).strip()
         
     async def update_source_credibility(self, source: str, signal_accuracy: float):
         """Update credibility score for a news source based on signal accuracy."""
         try:
             # Update history
             self.source_history[source].append(signal_accuracy)
-            if len(self.source_history[source]) > self.max_history_length:
-                self.source_history[source].pop(0)
             
-            # Calculate new credibility score
-            recent_accuracy = self.source_history[source][-min(100, len(self.source_history[source])):]
-            self.source_credibility[source] = np.mean(recent_accuracy)
+            # Blend into the exponentially weighted credibility score
+            self.source_credibility[source] += self.credibility_alpha * (
+                signal_accuracy - self.source_credibility[source]
+            )
             
         except Exception as e:
             self.logger.error(f"Credibility update failed for {source}: {str(e)}")
             
+    async def _acquire_api_budget(self, api: str):
+        """Wait until the per-minute budget for an API allows another call."""
+        calls = self.api_calls[api]
+        while True:
+            now = monotonic()
+            while calls and now - calls[0] >= 60.0:
+                calls.popleft()
+            if len(calls) < self.rate_limits[api]:
+                calls.append(now)
+                self.api_quotas[api] += 1
+                return
+            await asyncio.sleep(60.0 - (now - calls[0]))
+            
+    async def _api_get(self, api: str, url: str, **params) -> Optional[Union[Dict, List]]:
+        """Fetch JSON from a rate-limited API over the shared session."""
+        try:
+            # Wait for budget before taking a slot, so sleepers don't hold up requests
+            await self._acquire_api_budget(api)
+            async with self.api_semaphores[api]:
+                async with self.session.get(url, params=params) as response:
+                    response.raise_for_status()
+                    return await response.json()
+                    
+        except Exception as e:
+            self.logger.error(f"{api} request failed: {str(e)}")
+            return None
+            
     async def _load_credibility_history(self):
         """Load historical credibility data."""
         try:
@@ -187,6 +320,7 @@ class MediaAnalysisAgent:
         """Clean shutdown of the agent."""
         try:
             await self.session.close()
+            self.sentiment_cache.clear()
             self.logger.info("Media Analysis Agent shut down successfully")
             
         except Exception as e:
@@ -5,9 +5,49 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 import asyncio
-from scipy.stats import norm
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from numba import njit, prange
 
-@dataclass
+@njit(cache=True, fastmath=True)
+def _norm_pdf(x: float) -> float:
+    """Standard normal probability density."""
+    return math.exp(-0.5 * x * x) / 2.5066282746310002
+
+@njit(cache=True, fastmath=True)
+def _norm_cdf(x: float) -> float:
+    """Standard normal CDF (Abramowitz & Stegun 26.2.17, |error| < 7.5e-8)."""
+    t = 1.0 / (1.0 + 0.2316419 * abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 +
+                t * (-1.821255978 + t * 1.330274429))))
+    tail = poly * _norm_pdf(x)
+    return 1.0 - tail if x >= 0.0 else tail
+
+@njit(cache=True, fastmath=True)
+def _bs_price_vega(S: float, K: float, T: float, r: float, sigma: float, cp: float):
+    """Black-Scholes price and vega in one pass; cp is +1 for calls and -1 for puts."""
+    if T <= 0.0 or sigma <= 0.0:
+        return max(cp * (S - K), 0.0), 0.0
+    sqrt_T = math.sqrt(T)
+    d1 = (math.log(S / K) + (r + 0.5 * sigma * sigma) * T) / (sigma * sqrt_T)
+    d2 = d1 - sigma * sqrt_T
+    price = cp * (S * _norm_cdf(cp * d1) - K * math.exp(-r * T) * _norm_cdf(cp * d2))
+    return price, S * sqrt_T * _norm_pdf(d1)
+
+@njit(parallel=True, cache=True, fastmath=True)
+def _bs_price_vega_chain(S, K, T, r, sigma, cp, out_price, out_vega):
+    """Black-Scholes price and vega for every contract in a chain, written into out buffers."""
+    for i in prange(K.shape[0]):
+        out_price[i], out_vega[i] = _bs_price_vega(S[i], K[i], T[i], r, sigma[i], cp[i])
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _bs_price_vega_chain_serial(S, K, T, r, sigma, cp, out_price, out_vega):
+    """Single-threaded chain kernel for callers already running on a worker thread."""
+    for i in range(K.shape[0]):
+        out_price[i], out_vega[i] = _bs_price_vega(S[i], K[i], T[i], r, sigma[i], cp[i])
+
+@dataclass(slots=True)
 class OptionsData:
     symbol: str
     strike: float
@@ -24,6 +64,28 @@ class OptionsData:
     vega: float
     underlying_price: float
 
+# Columnar layout of the OptionsData fields used by the chain analytics
+OPTIONS_SOA_DTYPE = np.dtype([
+    ('symbol', 'U32'),  # OCC symbols are 21 characters; numpy truncates silently
+    ('expiration', 'datetime64[us]'),
+    ('call_flag', 'i1'),  # CALL=1, PUT=0
+    ('strike', 'f8'),
+    ('volume', 'i8'),
+    ('delta', 'f8'),
+    ('gamma', 'f8'),
+    ('bid', 'f8'),
+    ('ask', 'f8')
+])
+
+def options_to_soa(options: List[OptionsData]) -> np.ndarray:
+    """Pack a chain into a structured array with one contiguous buffer per field."""
+    return np.fromiter(
+        ((opt.symbol, opt.expiration, opt.option_type == 'CALL', opt.strike,
+          opt.volume, opt.delta, opt.gamma, opt.bid, opt.ask) for opt in options),
+        dtype=OPTIONS_SOA_DTYPE,
+        count=len(options)
+    )
+
 class OptionsChainAgent:
     """
     Options Chain Agent for analyzing options flow and generating trading signals.
@@ -48,6 +110,15 @@ class OptionsChainAgent:
         self.gamma_threshold = 0.1
         self.unusual_iv_threshold = 2.0
         
+        # Implied volatility solver
+        self.iv_max_iterations = 16
+        self.iv_tolerance = 1e-8
+        self.iv_bounds = (1e-4, 5.0)
+        
+        # Worker pool for batch chain analysis, created on first use
+        self.max_chain_workers = 10
+        self._greeks_pool = None
+        
     async def initialize(self) -> bool:
         """Initialize the Options Chain Agent."""
         try:
@@ -67,23 +138,30 @@ class OptionsChainAgent:
     async def process_options_data(self, options_chain: List[OptionsData]) -> List[Dict]:
         """Process options chain data and generate trading signals."""
         try:
-            # Group options by symbol
-            symbol_options = self._group_by_symbol(options_chain)
+            # Build the columnar view once and group options by symbol
+            chain_frame = self._build_chain_frame(options_chain)
+            symbols, symbol_rows = self._group_rows(chain_frame['symbol'])
+            
+            # Stamp every signal derived from this chain snapshot once
+            timestamp = datetime.now()
             
             signals = []
-            for symbol, options in symbol_options.items():
+            for symbol, rows in zip(symbols, symbol_rows):
+                options = [options_chain[i] for i in rows]
+                frame = chain_frame.iloc[rows]
+                
                 # Analyze unusual activity
-                unusual_signals = await self._detect_unusual_activity(options)
+                unusual_signals = await self._detect_unusual_activity(options, frame, timestamp)
                 if unusual_signals:
                     signals.extend(unusual_signals)
                 
                 # Analyze options flow
-                flow_signals = await self._analyze_options_flow(options)
+                flow_signals = await self._analyze_options_flow(frame, timestamp)
                 if flow_signals:
                     signals.extend(flow_signals)
                 
                 # Analyze Greeks patterns
-                greek_signals = await self._analyze_greeks_patterns(options)
+                greek_signals = await self._analyze_greeks_patterns(frame, timestamp)
                 if greek_signals:
                     signals.extend(greek_signals)
             
@@ -93,180 +171,266 @@ class OptionsChainAgent:
             self.logger.error(f"Options data processing failed: {str(e)}")
             return []
 
-    async def _detect_unusual_activity(self, options: List[OptionsData]) -> List[Dict]:
+    async def analyze_chains(self, chains: Dict[str, List[OptionsData]]) -> Dict[str, Dict]:
+        """Solve implied volatility and Greeks signals for several symbols' chains in parallel."""
+        try:
+            if self._greeks_pool is None:
+                self._greeks_pool = ThreadPoolExecutor(
+                    max_workers=self.max_chain_workers, thread_name_prefix="options-greeks"
+                )
+            
+            loop = asyncio.get_running_loop()
+            timestamp = datetime.now()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self._greeks_pool, self._analyze_chain, options, timestamp)
+                for options in chains.values()
+            ))
+            return dict(zip(chains, results))
+            
+        except Exception as e:
+            self.logger.error(f"Batch chain analysis failed: {str(e)}")
+            return {}
+
+    def _analyze_chain(self, options: List[OptionsData], timestamp: datetime) -> Dict:
+        """Implied volatility and Greeks signals for a single symbol's chain."""
+        # Parallelism comes from the pool; nested parallel kernels are not thread-safe
+        frame = self._build_chain_frame(options)
+        return {
+            'implied_volatility': self._calculate_iv_chain(
+                options, kernel=_bs_price_vega_chain_serial, now=timestamp
+            ),
+            'signals': self._greeks_exposure_signals(frame, timestamp)
+        }
+
+    async def _detect_unusual_activity(self, options: List[OptionsData], frame: pd.DataFrame,
+                                       timestamp: datetime) -> List[Dict]:
         """Detect unusual options activity based on volume and price patterns."""
         try:
             signals = []
+            if not options:
+                return signals
             
-            for option in options:
-                # Calculate dollar value of activity
-                dollar_value = option.volume * (option.bid + option.ask) / 2 * 100
-                
-                if dollar_value >= self.min_dollar_value:
-                    # Calculate historical average volume
-                    avg_volume = self._get_average_volume(option)
-                    volume_std = self._get_volume_std(option)
-                    
-                    # Check for unusual volume
-                    if volume_std > 0:
-                        z_score = (option.volume - avg_volume) / volume_std
-                        
-                        if abs(z_score) > self.flow_threshold:
-                            signal = {
-                                'symbol': option.symbol,
-                                'timestamp': datetime.now(),
-                                'signal_type': 'UNUSUAL_ACTIVITY',
-                                'direction': 'LONG' if option.option_type == 'CALL' else 'SHORT',
-                                'confidence': min(abs(z_score) / self.flow_threshold, 1.0),
-                                'metadata': {
-                                    'strike': option.strike,
-                                    'expiration': option.expiration,
-                                    'volume': option.volume,
-                                    'dollar_value': dollar_value,
-                                    'z_score': z_score
-                                }
-                            }
-                            signals.append(signal)
+            # Calculate dollar value of activity across the chain
+            volumes = frame['volume'].to_numpy(dtype=np.float64)
+            mid_prices = (frame['bid'].to_numpy() + frame['ask'].to_numpy()) / 2
+            dollar_values = volumes * mid_prices * 100
             
-            return signals
+            candidates = np.nonzero(dollar_values >= self.min_dollar_value)[0]
+            if candidates.size == 0:
+                return signals
+            
+            # Historical volume statistics for qualifying contracts only
+            avg_volumes = np.array([self._get_average_volume(options[i]) for i in candidates],
+                                   dtype=np.float64)
+            volume_stds = np.array([self._get_volume_std(options[i]) for i in candidates],
+                                   dtype=np.float64)
+            
+            # Check for unusual volume; contracts without volume dispersion never qualify
+            has_std = volume_stds > 0
+            z_scores = np.zeros(candidates.size)
+            z_scores[has_std] = (volumes[candidates][has_std] - avg_volumes[has_std]) / volume_stds[has_std]
+            unusual = np.abs(z_scores) > self.flow_threshold
+            
+            return [
+                {
+                    'symbol': option.symbol,
+                    'timestamp': timestamp,
+                    'signal_type': 'UNUSUAL_ACTIVITY',
+                    'direction': 'LONG' if option.option_type == 'CALL' else 'SHORT',
+                    'confidence': min(abs(z_score) / self.flow_threshold, 1.0),
+                    'metadata': {
+                        'strike': option.strike,
+                        'expiration': option.expiration,
+                        'volume': option.volume,
+                        'dollar_value': dollar_value,
+                        'z_score': z_score
+                    }
+                }
+                for option, dollar_value, z_score in zip(
+                    (options[i] for i in candidates[unusual]),
+                    dollar_values[candidates[unusual]].tolist(),
+                    z_scores[unusual].tolist())
+            ]
             
         except Exception as e:
             self.logger.error(f"Unusual activity detection failed: {str(e)}")
             return []
 
-    async def _analyze_options_flow(self, options: List[OptionsData]) -> List[Dict]:
+    async def _analyze_options_flow(self, frame: pd.DataFrame,
+                                    timestamp: datetime) -> List[Dict]:
         """Analyze options flow patterns and generate signals."""
         try:
-            signals = []
+            symbol = frame['symbol'].iat[0]
+            volume = frame['volume'].to_numpy(dtype=np.float64)
             
-            # Group by expiration
-            exp_groups = self._group_by_expiration(options)
+            # Bin contracts by (expiration, call flag); each row of the sums is [put, call]
+            exp_codes, expirations = pd.factorize(frame['expiration'])
+            bins = 2 * exp_codes + frame['call_flag'].to_numpy()
+            n_bins = 2 * len(expirations)
+            vol_sums = np.bincount(bins, weights=volume, minlength=n_bins).reshape(-1, 2)
+            flow_sums = np.bincount(bins, weights=volume * frame['delta'].to_numpy(),
+                                    minlength=n_bins).reshape(-1, 2)
             
-            for exp_date, exp_options in exp_groups.items():
-                # Calculate put-call ratio
-                put_call_ratio = self._calculate_put_call_ratio(exp_options)
-                
-                # Calculate flow intensity
-                flow_intensity = self._calculate_flow_intensity(exp_options)
-                
-                # Generate signals based on flow patterns
-                if abs(flow_intensity) > self.flow_threshold:
-                    signal = {
-                        'symbol': exp_options[0].symbol,
-                        'timestamp': datetime.now(),
-                        'signal_type': 'OPTIONS_FLOW',
-                        'direction': 'LONG' if flow_intensity > 0 else 'SHORT',
-                        'confidence': min(abs(flow_intensity) / self.flow_threshold, 1.0),
-                        'metadata': {
-                            'expiration': exp_date,
-                            'put_call_ratio': put_call_ratio,
-                            'flow_intensity': flow_intensity
-                        }
-                    }
-                    signals.append(signal)
+            # Put-call ratio is unbounded when there is no call volume
+            call_vol = vol_sums[:, 1]
+            has_calls = call_vol > 0
+            put_call_ratio = np.where(has_calls, vol_sums[:, 0] / np.where(has_calls, call_vol, 1.0), np.inf)
+            flow_intensity = flow_sums[:, 1] - flow_sums[:, 0]
             
-            return signals
+            # Generate signals based on flow patterns
+            flagged = np.flatnonzero(np.abs(flow_intensity) > self.flow_threshold)
+            intensity = flow_intensity[flagged]
+            confidence = np.minimum(np.abs(intensity) / self.flow_threshold, 1.0)
+            direction = np.where(intensity > 0, 'LONG', 'SHORT')
+            
+            return [
+                {
+                    'symbol': symbol,
+                    'timestamp': timestamp,
+                    'signal_type': 'OPTIONS_FLOW',
+                    'direction': side,
+                    'confidence': conf,
+                    'metadata': {
+                        'expiration': exp_date,
+                        'put_call_ratio': pcr,
+                        'flow_intensity': flow_intensity
+                    }
+                }
+                for exp_date, side, conf, pcr, flow_intensity in zip(
+                    expirations[flagged], direction.tolist(), confidence.tolist(),
+                    put_call_ratio[flagged].tolist(), intensity.tolist())
+            ]
             
         except Exception as e:
             self.logger.error(f"Options flow analysis failed: {str(e)}")
             return []
 
-    async def _analyze_greeks_patterns(self, options: List[OptionsData]) -> List[Dict]:
+    async def _analyze_greeks_patterns(self, frame: pd.DataFrame,
+                                       timestamp: datetime) -> List[Dict]:
         """Analyze options Greeks patterns for potential signals."""
         try:
-            signals = []
-            
-            # Calculate aggregate Greeks exposure
-            total_delta = sum(opt.delta * opt.volume for opt in options)
-            total_gamma = sum(opt.gamma * opt.volume for opt in options)
-            
-            # Check for significant Greeks imbalances
-            if abs(total_delta) > self.delta_threshold or abs(total_gamma) > self.gamma_threshold:
-                signal = {
-                    'symbol': options[0].symbol,
-                    'timestamp': datetime.now(),
-                    'signal_type': 'GREEKS_EXPOSURE',
-                    'direction': 'LONG' if total_delta > 0 else 'SHORT',
-                    'confidence': min(max(abs(total_delta), abs(total_gamma)), 1.0),
-                    'metadata': {
-                        'total_delta': total_delta,
-                        'total_gamma': total_gamma
-                    }
-                }
-                signals.append(signal)
-            
-            return signals
+            return self._greeks_exposure_signals(frame, timestamp)
             
         except Exception as e:
             self.logger.error(f"Greeks pattern analysis failed: {str(e)}")
             return []
 
+    def _greeks_exposure_signals(self, frame: pd.DataFrame, timestamp: datetime) -> List[Dict]:
+        """Generate signals from aggregate volume-weighted Greeks exposure."""
+        signals = []
+        
+        # Calculate aggregate Greeks exposure
+        volume = frame['volume'].to_numpy(dtype=np.float64)
+        total_delta = float(frame['delta'].to_numpy() @ volume)
+        total_gamma = float(frame['gamma'].to_numpy() @ volume)
+        
+        # Check for significant Greeks imbalances
+        if abs(total_delta) > self.delta_threshold or abs(total_gamma) > self.gamma_threshold:
+            signal = {
+                'symbol': frame['symbol'].iat[0],
+                'timestamp': timestamp,
+                'signal_type': 'GREEKS_EXPOSURE',
+                'direction': 'LONG' if total_delta > 0 else 'SHORT',
+                'confidence': min(max(abs(total_delta), abs(total_gamma)), 1.0),
+                'metadata': {
+                    'total_delta': total_delta,
+                    'total_gamma': total_gamma
+                }
+            }
+            signals.append(signal)
+        
+        return signals
+
     def _calculate_implied_volatility(self, option: OptionsData) -> float:
-        """Calculate implied volatility using Newton-Raphson method."""
+        """Calculate implied volatility for a single option."""
+        return float(self._calculate_iv_chain([option])[0])
+
+    def _calculate_iv_chain(self, options: List[OptionsData], kernel=_bs_price_vega_chain,
+                            now: Optional[datetime] = None) -> np.ndarray:
+        """Calculate implied volatility for a whole chain with a vectorized Newton-Raphson solver."""
         try:
-            # Implementation of Newton-Raphson method for IV calculation
             r = 0.02  # Risk-free rate
-            S = option.underlying_price
-            K = option.strike
-            T = (option.expiration - datetime.now()).days / 365.0
-            mid_price = (option.bid + option.ask) / 2
+            now = now or datetime.now()
+            n = len(options)
             
-            def black_scholes(S, K, T, r, sigma, option_type):
-                d1 = (np.log(S/K) + (r + sigma**2/2)*T) / (sigma*np.sqrt(T))
-                d2 = d1 - sigma*np.sqrt(T)
-                
-                if option_type == 'CALL':
-                    return S*norm.cdf(d1) - K*np.exp(-r*T)*norm.cdf(d2)
-                else:
-                    return K*np.exp(-r*T)*norm.cdf(-d2) - S*norm.cdf(-d1)
+            S = np.fromiter((opt.underlying_price for opt in options), dtype=np.float64, count=n)
+            K = np.fromiter((opt.strike for opt in options), dtype=np.float64, count=n)
             
-            # Newton-Raphson iteration
-            sigma = 0.5  # Initial guess
-            for _ in range(100):
-                price = black_scholes(S, K, T, r, sigma, option.option_type)
-                diff = mid_price - price
-                if abs(diff) < 0.0001:
-                    break
-                vega = S*np.sqrt(T)*norm.pdf(d1)
-                sigma = sigma + diff/vega
+            # Time to expiry is computed once per distinct expiration
+            T_by_expiry = {
+                exp: (exp - now).days / 365.0
+                for exp in {opt.expiration for opt in options}
+            }
+            T = np.fromiter((T_by_expiry[opt.expiration] for opt in options),
+                            dtype=np.float64, count=n)
             
-            return sigma
+            mid_price = np.fromiter(((opt.bid + opt.ask) / 2 for opt in options),
+                                    dtype=np.float64, count=n)
+            cp = np.fromiter((1.0 if opt.option_type == 'CALL' else -1.0 for opt in options),
+                             dtype=np.float64, count=n)
+            
+            # Expired contracts have no implied volatility
+            live = T > 0
+            
+            sigma_min, sigma_max = self.iv_bounds
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # Corrado-Miller closed-form seed, using put-call parity for puts
+                strike_pv = K * np.exp(-r * T)
+                call_price = np.where(cp > 0, mid_price, mid_price + S - strike_pv)
+                excess = call_price - (S - strike_pv) / 2
+                radicand = np.maximum(excess**2 - (S - strike_pv)**2 / np.pi, 0.0)
+                sigma = np.sqrt(2 * np.pi / T) / (S + strike_pv) * (excess + np.sqrt(radicand))
+                sigma = np.clip(np.nan_to_num(sigma, nan=0.5), sigma_min, sigma_max)
+                
+                # Newton-Raphson iteration, falling back to bisection inside [lo, hi]
+                lo = np.full(n, sigma_min)
+                hi = np.full(n, sigma_max)
+                price = np.empty(n)
+                vega = np.empty(n)
+                for _ in range(self.iv_max_iterations):
+                    kernel(S, K, T, r, sigma, cp, price, vega)
+                    
+                    diff = mid_price - price
+                    active = live & np.isfinite(diff) & (np.abs(diff) >= self.iv_tolerance)
+                    if not active.any():
+                        break
+                    
+                    # Price increases with sigma, so the sign of diff tightens the bracket
+                    lo = np.where(active & (diff > 0), sigma, lo)
+                    hi = np.where(active & (diff < 0), sigma, hi)
+                    
+                    newton = sigma + diff / vega
+                    in_bracket = (vega > 1e-8) & (newton > lo) & (newton < hi)
+                    step = np.where(in_bracket, newton, 0.5 * (lo + hi))
+                    sigma = np.where(active, step, sigma)
+            
+            return np.where(live, sigma, np.nan)
             
         except Exception as e:
             self.logger.error(f"IV calculation failed: {str(e)}")
-            return 0.0
-
-    def _group_by_symbol(self, options: List[OptionsData]) -> Dict[str, List[OptionsData]]:
-        """Group options data by symbol."""
-        grouped = defaultdict(list)
-        for option in options:
-            grouped[option.symbol].append(option)
-        return grouped
+            return np.zeros(len(options))
 
-    def _group_by_expiration(self, options: List[OptionsData]) -> Dict[datetime, List[OptionsData]]:
-        """Group options by expiration date."""
-        grouped = defaultdict(list)
-        for option in options:
-            grouped[option.expiration].append(option)
-        return grouped
+    def _build_chain_frame(self, options: List[OptionsData]) -> pd.DataFrame:
+        """Build a columnar view of the chain once per snapshot."""
+        return pd.DataFrame(options_to_soa(options))
 
-    def _calculate_put_call_ratio(self, options: List[OptionsData]) -> float:
-        """Calculate put-call ratio for a group of options."""
-        call_volume = sum(opt.volume for opt in options if opt.option_type == 'CALL')
-        put_volume = sum(opt.volume for opt in options if opt.option_type == 'PUT')
-        return put_volume / call_volume if call_volume > 0 else float('inf')
-
-    def _calculate_flow_intensity(self, options: List[OptionsData]) -> float:
-        """Calculate the intensity of options flow."""
-        call_flow = sum(opt.volume * opt.delta for opt in options if opt.option_type == 'CALL')
-        put_flow = sum(opt.volume * opt.delta for opt in options if opt.option_type == 'PUT')
-        return call_flow - put_flow
+    def _group_rows(self, values: pd.Series) -> Tuple[pd.Index, List[np.ndarray]]:
+        """Bucket row positions by value using integer codes and a stable sort."""
+        codes, uniques = pd.factorize(values)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+        return uniques, np.split(order, bounds)
 
     async def shutdown(self):
         """Clean shutdown of the agent."""
         try:
             # Save historical data
             await self._save_historical_data()
+            
+            # Stop batch analysis workers
+            if self._greeks_pool is not None:
+                self._greeks_pool.shutdown(wait=False)
+            
             self.logger.info("Options Chain Agent shut down successfully")
             
         except Exception as e:
@@ -1,11 +1,25 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import os
+import joblib
 import numpy as np
-import pandas as pd
 import logging
 from enum import Enum
 import asyncio
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def _var_kernel(returns_matrix, notional, q):
+    """Lower q-quantile of notional-weighted portfolio returns, fused into one pass per row."""
+    n_days = returns_matrix.shape[1]
+    portfolio_returns = np.zeros(n_days)
+    for i in range(returns_matrix.shape[0]):
+        weight = notional[i]
+        for j in range(n_days):
+            portfolio_returns[j] += weight * returns_matrix[i, j]
+    k = int(q * (n_days - 1))
+    return np.partition(portfolio_returns, k)[k]
 
 class RiskLevel(Enum):
     LOW = "LOW"
@@ -13,7 +27,7 @@ class RiskLevel(Enum):
     HIGH = "HIGH"
     CRITICAL = "CRITICAL"
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     symbol: str
     direction: str  # 'LONG' or 'SHORT'
@@ -23,12 +37,114 @@ class Position:
     unrealized_pnl: float
     timestamp: datetime
     metadata: Dict
+    direction_sign: float = field(init=False)  # +1 long, -1 short
+    
+    def __post_init__(self):
+        self.direction_sign = 1.0 if self.direction == 'LONG' else -1.0
 
-@dataclass
+class PortfolioBook:
+    """
+    Positions stored as parallel NumPy arrays with a symbol-to-row index.
+    Array properties are views over the occupied rows.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        self.symbols = []
+        self._index = {}
+        self._quantity = np.zeros(capacity)
+        self._entry_price = np.zeros(capacity)
+        self._current_price = np.zeros(capacity)
+        self._direction_sign = np.zeros(capacity)  # +1 long, -1 short
+        self._unrealized_pnl = np.zeros(capacity)
+        self._timestamps = []
+        self._metadata = []
+        
+    def __len__(self) -> int:
+        return len(self.symbols)
+        
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
+        
+    @property
+    def quantity(self) -> np.ndarray:
+        return self._quantity[:len(self.symbols)]
+        
+    @property
+    def entry_price(self) -> np.ndarray:
+        return self._entry_price[:len(self.symbols)]
+        
+    @property
+    def current_price(self) -> np.ndarray:
+        return self._current_price[:len(self.symbols)]
+        
+    @property
+    def direction_sign(self) -> np.ndarray:
+        return self._direction_sign[:len(self.symbols)]
+        
+    @property
+    def unrealized_pnl(self) -> np.ndarray:
+        return self._unrealized_pnl[:len(self.symbols)]
+        
+    def add_position(self, position: Position):
+        """Insert or replace a position's row, growing the arrays 2x when full."""
+        i = self._index.get(position.symbol)
+        if i is None:
+            i = len(self.symbols)
+            if i == self._quantity.shape[0]:
+                capacity = 2 * max(i, 1)
+                self._quantity = np.resize(self._quantity, capacity)
+                self._entry_price = np.resize(self._entry_price, capacity)
+                self._current_price = np.resize(self._current_price, capacity)
+                self._direction_sign = np.resize(self._direction_sign, capacity)
+                self._unrealized_pnl = np.resize(self._unrealized_pnl, capacity)
+            self._index[position.symbol] = i
+            self.symbols.append(position.symbol)
+            self._timestamps.append(position.timestamp)
+            self._metadata.append(position.metadata)
+        else:
+            self._timestamps[i] = position.timestamp
+            self._metadata[i] = position.metadata
+        
+        self._quantity[i] = position.quantity
+        self._entry_price[i] = position.entry_price
+        self._current_price[i] = position.current_price
+        self._direction_sign[i] = position.direction_sign
+        self._unrealized_pnl[i] = position.unrealized_pnl
+        
+    def get_position(self, symbol: str) -> Position:
+        """Materialize a Position view of a row."""
+        i = self._index[symbol]
+        return Position(
+            symbol=symbol,
+            direction='LONG' if self._direction_sign[i] > 0 else 'SHORT',
+            quantity=float(self._quantity[i]),
+            entry_price=float(self._entry_price[i]),
+            current_price=float(self._current_price[i]),
+            unrealized_pnl=float(self._unrealized_pnl[i]),
+            timestamp=self._timestamps[i],
+            metadata=self._metadata[i]
+        )
+        
+    def update_price(self, symbol: str, price: float, quantity: float = None):
+        """Mark a position to a new price and refresh its unrealized P&L."""
+        i = self._index[symbol]
+        self._current_price[i] = price
+        if quantity is not None:
+            self._quantity[i] = quantity
+        self._unrealized_pnl[i] = (price - self._entry_price[i]) * self._quantity[i] * self._direction_sign[i]
+        
+    def mark_to_market(self, prices: np.ndarray):
+        """Set every row's price (aligned with symbols) and revalue the whole book in one pass."""
+        current_price = self.current_price
+        current_price[:] = prices
+        np.multiply(current_price - self.entry_price, self.quantity * self.direction_sign,
+                    out=self.unrealized_pnl)
+
+@dataclass(slots=True)
 class PortfolioState:
     total_value: float
     cash: float
-    positions: Dict[str, Position]
+    positions: PortfolioBook
     risk_exposure: float
     margin_used: float
     margin_available: float
@@ -56,13 +172,41 @@ class RiskManagementAgent:
         # Risk Metrics
         self.var_confidence = 0.95  # 95% VaR confidence level
         self.var_window = 252  # One year of trading days
+        self.debug_var = False  # Cross-check the VaR kernel against np.percentile
         self.stress_test_scenarios = self._initialize_stress_scenarios()
+        scenarios = self.stress_test_scenarios
+        self._stress_names = tuple(scenarios)
+        self._stress_price = np.fromiter(
+            (params.get('price_change', 0) for params in scenarios.values()),
+            dtype=np.float64, count=len(scenarios)
+        )
         
         # Position tracking
-        self.positions = {}
+        self.positions = PortfolioBook()
         self.historical_positions = {}
         self.risk_metrics = {}
         
+        # Historical returns matrix for VaR, one row per symbol. Rows are right-aligned
+        # (latest day in the last column) and NaN-padded when a history is shorter
+        # than var_window; _returns_lengths holds each row's valid trailing window.
+        self._returns_matrix = np.full((0, self.var_window), np.nan)
+        self._returns_lengths = np.zeros(0, dtype=np.int64)
+        self._returns_index = {}
+        self._stale_returns = set()
+        
+        # Daily historical returns cache, persisted across restarts
+        self.returns_cache_dir = "./cache/returns"
+        self._returns_cache = {}  # symbol -> (as_of_date, returns)
+        self._returns_cache_hits = 0
+        self._returns_cache_misses = 0
+        
+        # Running covariance of book returns (Welford), reset when the symbol set changes
+        self._cov_symbols = []
+        self._cov_prices = np.zeros(0)
+        self._cov_mean = np.zeros(0)
+        self._cov_m2 = np.zeros((0, 0))
+        self._cov_count = 0
+        
     async def initialize(self) -> bool:
         """Initialize the Risk Management Agent."""
         try:
@@ -71,10 +215,14 @@ class RiskManagementAgent:
             
             # Load historical data
             await self._load_historical_data()
+            await asyncio.to_thread(self._load_returns_cache)
             
             # Initialize correlation matrix
             await self._initialize_correlation_matrix()
             
+            # Compile numeric kernels ahead of the first risk calculation
+            _var_kernel(np.zeros((1, 2)), np.ones(1), 1 - self.var_confidence)
+            
             self.logger.info("Risk Management Agent initialized successfully")
             return True
             
@@ -89,7 +237,7 @@ class RiskManagementAgent:
             direction = signal['direction']
             
             # Calculate position size
-            position_size = await self._calculate_position_size(signal, portfolio)
+            position_size = self._calculate_position_size(signal, portfolio)
             
             # Check risk limits
             risk_checks = await self._perform_risk_checks(symbol, direction, position_size, portfolio)
@@ -114,7 +262,7 @@ class RiskManagementAgent:
             self.logger.error(f"Trade validation failed: {str(e)}")
             return False, {'reason': 'Validation error'}
 
-    async def _calculate_position_size(self, signal: Dict, portfolio: PortfolioState) -> float:
+    def _calculate_position_size(self, signal: Dict, portfolio: PortfolioState) -> float:
         """Calculate appropriate position size based on risk parameters."""
         try:
             # Get base position size from portfolio value
@@ -125,11 +273,11 @@ class RiskManagementAgent:
             adjusted_size = base_size * confidence_factor
             
             # Adjust for market volatility
-            volatility_factor = await self._calculate_volatility_factor(signal['symbol'])
+            volatility_factor = self._calculate_volatility_factor(signal['symbol'])
             adjusted_size *= volatility_factor
             
             # Adjust for correlation with existing positions
-            correlation_factor = await self._calculate_correlation_factor(signal['symbol'], portfolio)
+            correlation_factor = self._calculate_correlation_factor(signal['symbol'], portfolio)
             adjusted_size *= correlation_factor
             
             return min(adjusted_size, base_size)
@@ -142,20 +290,38 @@ class RiskManagementAgent:
                                  position_size: float, portfolio: PortfolioState) -> Dict[str, bool]:
         """Perform comprehensive risk checks."""
         try:
-            return {
-                'portfolio_risk': await self._check_portfolio_risk(portfolio),
-                'position_limit': await self._check_position_limit(position_size, portfolio),
-                'sector_exposure': await self._check_sector_exposure(symbol, position_size, portfolio),
-                'correlation_risk': await self._check_correlation_risk(symbol, portfolio),
-                'leverage_limit': await self._check_leverage_limit(position_size, portfolio),
-                'margin_requirement': await self._check_margin_requirement(position_size, portfolio),
-                'liquidity_risk': await self._check_liquidity_risk(symbol, position_size)
-            }
+            # Limit checks are cheap array math, so they run inline on the loop
+            try:
+                limits = self._check_portfolio_limits(symbol, position_size, portfolio)
+            except Exception as e:
+                self.logger.error(f"Portfolio limit checks failed: {str(e)}")
+                limits = {'portfolio_limits': False}
+            
+            # A liquidity check that raised counts as failed
+            try:
+                liquidity = await self._check_liquidity_risk(symbol, position_size)
+            except Exception as e:
+                self.logger.error(f"Liquidity check failed: {str(e)}")
+                liquidity = False
+            
+            return {**limits, 'liquidity_risk': liquidity}
             
         except Exception as e:
             self.logger.error(f"Risk checks failed: {str(e)}")
             return {'error': False}
 
+    def _check_portfolio_limits(self, symbol: str, position_size: float,
+                                portfolio: PortfolioState) -> Dict[str, bool]:
+        """Evaluate the portfolio, position, exposure, leverage and margin limits."""
+        return {
+            'portfolio_risk': self._check_portfolio_risk(portfolio),
+            'position_limit': self._check_position_limit(position_size, portfolio),
+            'sector_exposure': self._check_sector_exposure(symbol, position_size, portfolio),
+            'correlation_risk': self._check_correlation_risk(symbol, portfolio),
+            'leverage_limit': self._check_leverage_limit(position_size, portfolio),
+            'margin_requirement': self._check_margin_requirement(position_size, portfolio)
+        }
+
     async def calculate_portfolio_risk(self, portfolio: PortfolioState) -> Dict:
         """Calculate comprehensive portfolio risk metrics."""
         try:
@@ -164,8 +330,12 @@ class RiskManagementAgent:
                 'beta': await self._calculate_portfolio_beta(portfolio),
                 'sharpe_ratio': await self._calculate_sharpe_ratio(portfolio),
                 'max_drawdown': await self._calculate_max_drawdown(portfolio),
-                'correlation_matrix': await self._update_correlation_matrix(portfolio),
-                'stress_test_results': await self._run_stress_tests(portfolio)
+                'correlation_matrix': self._correlation_matrix(),
+                'stress_test_results': self._run_stress_tests(portfolio),
+                'returns_cache': {
+                    'hits': self._returns_cache_hits,
+                    'misses': self._returns_cache_misses
+                }
             }
             
             self.risk_metrics = risk_metrics
@@ -178,14 +348,25 @@ class RiskManagementAgent:
     async def _calculate_value_at_risk(self, portfolio: PortfolioState) -> float:
         """Calculate Value at Risk using historical simulation."""
         try:
-            returns = []
-            for symbol, position in portfolio.positions.items():
-                hist_returns = await self._get_historical_returns(symbol)
-                weighted_returns = hist_returns * position.quantity * position.current_price
-                returns.append(weighted_returns)
+            book = portfolio.positions
+            await self._refresh_returns_matrix(book.symbols)
+            
+            # Use the trailing days every position has history for
+            rows = [self._returns_index[symbol] for symbol in book.symbols]
+            window = int(self._returns_lengths[rows].min()) if rows else 0
+            if window < 2:
+                raise ValueError(f"Insufficient return history for VaR ({window} days)")
+            returns = self._returns_matrix[rows, -window:]
             
-            portfolio_returns = np.sum(returns, axis=0)
-            var = np.percentile(portfolio_returns, (1 - self.var_confidence) * 100)
+            # Portfolio P&L per historical day and its loss quantile in one kernel
+            notional = book.quantity * book.current_price
+            var = _var_kernel(returns, notional, 1 - self.var_confidence)
+            
+            if self.debug_var:
+                reference = np.percentile(notional @ returns,
+                                          (1 - self.var_confidence) * 100, method='lower')
+                if not np.isclose(var, reference):
+                    self.logger.warning(f"VaR kernel mismatch: {var} vs percentile {reference}")
             
             return abs(var)
             
@@ -193,23 +374,97 @@ class RiskManagementAgent:
             self.logger.error(f"VaR calculation failed: {str(e)}")
             return float('inf')
 
-    async def _run_stress_tests(self, portfolio: PortfolioState) -> Dict:
-        """Run stress test scenarios on the portfolio."""
+    async def _refresh_returns_matrix(self, symbols: List[str]):
+        """Fetch historical returns concurrently for symbols missing or stale in the matrix."""
+        missing = [
+            symbol for symbol in symbols
+            if symbol not in self._returns_index or symbol in self._stale_returns
+        ]
+        if not missing:
+            return
+        
+        fetched = await asyncio.gather(*(self._get_cached_returns(symbol) for symbol in missing))
+        
+        # Right-align each history in a NaN-padded row before touching the matrix
+        rows = []
+        for hist_returns in fetched:
+            hist_returns = np.asarray(hist_returns, dtype=np.float64)[-self.var_window:]
+            row = np.full(self.var_window, np.nan)
+            row[self.var_window - len(hist_returns):] = hist_returns
+            rows.append((row, len(hist_returns)))
+        
+        # Grow the matrix for new symbols
+        n_new = sum(symbol not in self._returns_index for symbol in missing)
+        if n_new:
+            self._returns_matrix = np.vstack(
+                [self._returns_matrix, np.full((n_new, self.var_window), np.nan)]
+            )
+            self._returns_lengths = np.concatenate(
+                [self._returns_lengths, np.zeros(n_new, dtype=np.int64)]
+            )
+        
+        # Write each row, indexing new symbols only once their row holds data
+        for symbol, (row, length) in zip(missing, rows):
+            index = self._returns_index.get(symbol, len(self._returns_index))
+            self._returns_matrix[index] = row
+            self._returns_lengths[index] = length
+            self._returns_index[symbol] = index
+            self._stale_returns.discard(symbol)
+
+    async def _get_cached_returns(self, symbol: str) -> np.ndarray:
+        """Historical returns for a symbol, fetched at most once per day."""
+        today = date.today()
+        cached = self._returns_cache.get(symbol)
+        if cached is not None and cached[0] == today:
+            self._returns_cache_hits += 1
+            return cached[1]
+        
+        self._returns_cache_misses += 1
+        hist_returns = np.asarray(await self._get_historical_returns(symbol), dtype=np.float64)
+        self._returns_cache[symbol] = (today, hist_returns)
+        return hist_returns
+
+    def _load_returns_cache(self):
+        """Load today's persisted historical returns."""
         try:
-            results = {}
-            for scenario, params in self.stress_test_scenarios.items():
-                scenario_pnl = 0
-                for symbol, position in portfolio.positions.items():
-                    price_change = params.get('price_change', 0)
-                    vol_change = params.get('volatility_change', 0)
-                    scenario_pnl += self._calculate_scenario_pnl(position, price_change, vol_change)
+            if not os.path.isdir(self.returns_cache_dir):
+                return
+            
+            today = date.today()
+            for filename in os.listdir(self.returns_cache_dir):
+                if filename.endswith(".pkl"):
+                    as_of, hist_returns = joblib.load(os.path.join(self.returns_cache_dir, filename))
+                    if as_of == today:
+                        self._returns_cache[filename[:-4]] = (as_of, hist_returns)
+                        
+        except Exception as e:
+            self.logger.error(f"Returns cache loading failed: {str(e)}")
+
+    def _save_returns_cache(self):
+        """Persist cached historical returns, one file per symbol."""
+        try:
+            os.makedirs(self.returns_cache_dir, exist_ok=True)
+            for symbol, entry in self._returns_cache.items():
+                joblib.dump(entry, os.path.join(self.returns_cache_dir, f"{symbol}.pkl"))
                 
-                results[scenario] = {
-                    'pnl': scenario_pnl,
-                    'pnl_percentage': scenario_pnl / portfolio.total_value
-                }
+        except Exception as e:
+            self.logger.error(f"Returns cache saving failed: {str(e)}")
+
+    def _run_stress_tests(self, portfolio: PortfolioState) -> Dict:
+        """Run stress test scenarios on the portfolio."""
+        try:
+            # Signed notional exposure per position (shorts gain when prices fall)
+            book = portfolio.positions
+            exposure = book.quantity * book.current_price * book.direction_sign
+            
+            # Linear price shock applied to every position in every scenario at once
+            scenario_pnl = (self._stress_price[:, None] * exposure[None, :]).sum(axis=1)
+            pnl_percentage = scenario_pnl / portfolio.total_value
             
-            return results
+            return {
+                scenario: {'pnl': float(pnl), 'pnl_percentage': float(pct)}
+                for scenario, pnl, pct in zip(self._stress_names, scenario_pnl, pnl_percentage)
+            }
             
         except Exception as e:
             self.logger.error(f"Stress testing failed: {str(e)}")
@@ -236,16 +491,10 @@ class RiskManagementAgent:
         """Update position information and risk metrics."""
         try:
             if symbol in self.positions:
-                position = self.positions[symbol]
-                position.current_price = price
-                if quantity is not None:
-                    position.quantity = quantity
+                self.positions.update_price(symbol, price, quantity)
                 
-                position.unrealized_pnl = (
-                    (price - position.entry_price) * position.quantity
-                    if position.direction == 'LONG'
-                    else (position.entry_price - price) * position.quantity
-                )
+                # Historical returns for this symbol are refetched on next VaR
+                self._stale_returns.add(symbol)
                 
                 # Update risk metrics
                 await self._update_risk_metrics(symbol)
@@ -253,11 +502,57 @@ class RiskManagementAgent:
         except Exception as e:
             self.logger.error(f"Position update failed: {str(e)}")
 
+    async def update_prices(self, prices: np.ndarray):
+        """Mark the whole book to a price snapshot aligned with its symbols."""
+        try:
+            prices = np.asarray(prices, dtype=np.float64)
+            self._update_covariance(prices)
+            self.positions.mark_to_market(prices)
+            
+        except Exception as e:
+            self.logger.error(f"Price snapshot update failed: {str(e)}")
+
+    def _update_covariance(self, prices: np.ndarray):
+        """Fold one snapshot of log returns into the running covariance in O(N^2)."""
+        if not (np.isfinite(prices).all() and (prices > 0).all()):
+            # A zero or missing price would poison the running sums; skip the snapshot
+            self.logger.warning("Skipping covariance update for snapshot with non-positive prices")
+            return
+        
+        if self._cov_symbols != self.positions.symbols:
+            # Asset set changed: restart the estimate from this snapshot
+            n = len(prices)
+            self._cov_symbols = list(self.positions.symbols)
+            self._cov_prices = prices.copy()
+            self._cov_mean = np.zeros(n)
+            self._cov_m2 = np.zeros((n, n))
+            self._cov_count = 0
+            return
+        
+        returns = np.log(prices / self._cov_prices)
+        self._cov_prices = prices.copy()
+        self._cov_count += 1
+        delta = returns - self._cov_mean
+        self._cov_mean += delta / self._cov_count
+        self._cov_m2 += np.outer(delta, returns - self._cov_mean)
+
+    def _correlation_matrix(self) -> Optional[Dict]:
+        """Correlation of book returns with its symbol order, or None until two returns are seen."""
+        if self._cov_count < 2:
+            return None
+        
+        cov = self._cov_m2 / (self._cov_count - 1)
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        return {'symbols': list(self._cov_symbols), 'matrix': np.nan_to_num(corr)}
+
     async def shutdown(self):
         """Clean shutdown of the agent."""
         try:
             # Save position and risk data
             await self._save_historical_data()
+            await asyncio.to_thread(self._save_returns_cache)
             self.logger.info("Risk Management Agent shut down successfully")
             
         except Exception as e:
@@ -0,0 +1,28 @@
+import os
+import socket
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Final
+from dotenv import load_dotenv
+
+@lru_cache(maxsize=None)
+def load_env() -> MappingProxyType:
+    """
+    Parse .env once and return a read-only snapshot of the environment.
+    """
+    load_dotenv(dotenv_path="./.env")
+    return MappingProxyType(dict(os.environ))
+
+_env = load_env()
+
+# Polygon API Key from .env
+POLYGON_API_KEY: Final = _env.get("POLYGON_API_KEY")
+
+# Redis Configuration
+REDIS_HOST: Final = _env.get("REDIS_HOST", "localhost")
+REDIS_PORT: Final = int(_env.get("REDIS_PORT", 6379))
+REDIS_CHANNEL: Final = _env.get("REDIS_CHANNEL", "market-data")
+
+# Consumer group and consumer name for reading the market data stream
+REDIS_CONSUMER_GROUP: Final = _env.get("REDIS_CONSUMER_GROUP", "core")
+REDIS_CONSUMER: Final = _env.get("REDIS_CONSUMER", socket.gethostname())
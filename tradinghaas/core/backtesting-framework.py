@@ -20,7 +20,7 @@ class BacktestConfig:
     enable_fractional: bool = True
     data_sources: Dict[str, str] = None
 
-@dataclass
+@dataclass(slots=True)
 class BacktestPosition:
     symbol: str
     direction: str
@@ -35,24 +35,57 @@ class BacktestPosition:
 class BacktestMetrics:
     """Calculate and store backtest performance metrics."""
     
-    def __init__(self):
-        self.daily_returns = []
+    def __init__(self, capacity: int = 256):
         self.trade_history = []
         self.positions_history = []
-        self.equity_curve = []
-        self.drawdowns = []
+        
+        # Daily series stored in growable NumPy buffers
+        self._returns = np.empty(capacity)
+        self._equity = np.empty(capacity)
+        self._drawdowns = np.empty(capacity)
+        self._n = 0
+        
+    @property
+    def daily_returns(self) -> np.ndarray:
+        return self._returns[:self._n]
+        
+    @property
+    def equity_curve(self) -> np.ndarray:
+        return self._equity[:self._n]
+        
+    @property
+    def drawdowns(self) -> np.ndarray:
+        return self._drawdowns[:self._n]
+        
+    def record(self, daily_return: float, equity: float, drawdown: float):
+        """Append one day of return, equity and drawdown in O(1)."""
+        if self._n == self._returns.shape[0]:
+            capacity = 2 * self._n
+            self._returns = np.resize(self._returns, capacity)
+            self._equity = np.resize(self._equity, capacity)
+            self._drawdowns = np.resize(self._drawdowns, capacity)
+        
+        self._returns[self._n] = daily_return
+        self._equity[self._n] = equity
+        self._drawdowns[self._n] = drawdown
+        self._n += 1
         
     def calculate_metrics(self) -> Dict:
         """Calculate comprehensive performance metrics."""
         try:
-            returns = np.array(self.daily_returns)
-            equity = np.array(self.equity_curve)
+            returns = self.daily_returns
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # Compound in log space; mean and variance share one centred pass
+                total_return = np.expm1(np.log1p(returns).sum())
+                mean_return = returns.sum() / returns.size
+                std_return = np.sqrt(np.square(returns - mean_return).sum() / returns.size)
+                sharpe_ratio = np.sqrt(252) * mean_return / std_return
             
             return {
-                'total_return': float(np.prod(1 + returns) - 1),
-                'annual_return': float(np.mean(returns) * 252),
-                'sharpe_ratio': float(np.sqrt(252) * np.mean(returns) / np.std(returns)),
-                'max_drawdown': float(np.min(self.drawdowns)),
+                'total_return': float(total_return),
+                'annual_return': float(mean_return * 252),
+                'sharpe_ratio': float(sharpe_ratio),
+                'max_drawdown': float(self.drawdowns.max(initial=0.0)),
                 'win_rate': self._calculate_win_rate(),
                 'profit_factor': self._calculate_profit_factor(),
                 'avg_trade': self._calculate_avg_trade(),
@@ -77,17 +110,39 @@ class BacktestingFramework:
         self.current_time = config.start_date
         self.data_buffer = {}
         
-        # Portfolio Management
-        self.positions = {}
+        # Portfolio Management (positions stored as parallel arrays by symbol index)
+        self._symbols = list(config.symbols)
+        self._symbol_index = {symbol: i for i, symbol in enumerate(self._symbols)}
+        self._pos_qty = np.zeros(len(self._symbols))
+        self._pos_entry = np.zeros(len(self._symbols))
+        self._pos_price = np.zeros(len(self._symbols))
+        self._pos_entry_time = [None] * len(self._symbols)
         self.cash = config.initial_capital
         self.equity = config.initial_capital
+        self._peak_equity = config.initial_capital
         
         # Performance Tracking
-        self.metrics = BacktestMetrics()
+        self.metrics = BacktestMetrics(capacity=max((config.end_date - config.start_date).days + 1, 1))
         
         # Agent States
         self.agent_states = {}
         
+    @property
+    def positions(self) -> Dict[str, BacktestPosition]:
+        """Open positions, materialized from the position arrays."""
+        return {
+            self._symbols[i]: BacktestPosition(
+                symbol=self._symbols[i],
+                direction='BUY' if self._pos_qty[i] > 0 else 'SELL',
+                quantity=float(self._pos_qty[i]),
+                entry_price=float(self._pos_entry[i]),
+                entry_time=self._pos_entry_time[i],
+                current_price=float(self._pos_price[i]),
+                unrealized_pnl=float(self._pos_qty[i] * (self._pos_price[i] - self._pos_entry[i]))
+            )
+            for i in np.flatnonzero(self._pos_qty)
+        }
+
     async def initialize(self) -> bool:
         """Initialize the backtesting environment."""
         try:
@@ -234,25 +289,23 @@ class BacktestingFramework:
             commission = price * size * self.config.commission_rate
             total_cost = (price * size) + commission
             
-            # Update position
-            if symbol not in self.positions:
-                self.positions[symbol] = BacktestPosition(
-                    symbol=symbol,
-                    direction=direction,
-                    quantity=size,
-                    entry_price=price,
-                    entry_time=self.current_time,
-                    current_price=price,
-                    unrealized_pnl=0.0
-                )
-            else:
-                # Update existing position
-                position = self.positions[symbol]
-                position.quantity += size if direction == 'BUY' else -size
-                position.entry_price = (position.entry_price + price) / 2
+            # Update position (quantity is signed: negative when short)
+            signed_size = size if direction == 'BUY' else -size
+            idx = self._position_index(symbol)
+            quantity = self._pos_qty[idx]
+            new_quantity = quantity + signed_size
+            if quantity == 0 or quantity * new_quantity < 0:
+                # Opened from flat or flipped through it: new position at this price
+                self._pos_entry[idx] = price
+                self._pos_entry_time[idx] = self.current_time
+                self._pos_price[idx] = price
+            elif quantity * signed_size > 0:
+                # Adding to the position: volume-weighted average entry
+                self._pos_entry[idx] = (self._pos_entry[idx] * quantity + price * signed_size) / new_quantity
+            self._pos_qty[idx] = new_quantity
                 
-            # Update cash
-            self.cash -= total_cost
+            # Update cash: buys pay the notional, sells (including short opens) receive it
+            self.cash -= signed_size * price + commission
             
             # Record trade
             self.metrics.trade_history.append({
@@ -268,27 +321,46 @@ class BacktestingFramework:
         except Exception as e:
             self.logger.error(f"Portfolio update failed: {str(e)}")
 
+    def _position_index(self, symbol: str) -> int:
+        """Slot of a symbol in the position arrays, adding one if it is new."""
+        idx = self._symbol_index.get(symbol)
+        if idx is None:
+            idx = len(self._symbols)
+            self._symbols.append(symbol)
+            self._symbol_index[symbol] = idx
+            self._pos_qty = np.append(self._pos_qty, 0.0)
+            self._pos_entry = np.append(self._pos_entry, 0.0)
+            self._pos_price = np.append(self._pos_price, 0.0)
+            self._pos_entry_time.append(None)
+        return idx
+
+    async def _update_positions(self):
+        """Mark open positions to the current market price."""
+        try:
+            held = np.flatnonzero(self._pos_qty)
+            self._pos_price[held] = [self._get_market_price(self._symbols[i]) for i in held]
+            
+        except Exception as e:
+            self.logger.error(f"Position update failed: {str(e)}")
+
     async def _calculate_daily_metrics(self):
         """Calculate daily performance metrics."""
         try:
             # Calculate portfolio value
-            portfolio_value = self.cash
-            for position in self.positions.values():
-                portfolio_value += position.quantity * position.current_price
+            portfolio_value = self.cash + float(self._pos_qty @ self._pos_price)
             
             # Calculate daily return
             prev_equity = self.equity
             self.equity = portfolio_value
             daily_return = (self.equity - prev_equity) / prev_equity
             
-            # Update metrics
-            self.metrics.daily_returns.append(daily_return)
-            self.metrics.equity_curve.append(self.equity)
+            # Calculate drawdown against the running equity peak
+            if self.equity > self._peak_equity:
+                self._peak_equity = self.equity
+            drawdown = (self._peak_equity - self.equity) / self._peak_equity
             
-            # Calculate drawdown
-            peak = max(self.metrics.equity_curve)
-            drawdown = (peak - self.equity) / peak
-            self.metrics.drawdowns.append(drawdown)
+            # Update metrics
+            self.metrics.record(daily_return, self.equity, drawdown)
             
         except Exception as e:
             self.logger.error(f"Daily metrics calculation failed: {str(e)}")
@@ -318,7 +390,7 @@ class BacktestingFramework:
             
             # Clean up resources
             self.market_data.clear()
-            self.positions.clear()
+            self._pos_qty.fill(0.0)
             
             self.logger.info("Backtesting Framework shut down successfully")
             
@@ -1,13 +1,54 @@
+import os
 import yaml
-import json
-from typing import Dict, List, Any, Optional
+import orjson
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import logging
 import asyncio
 from pathlib import Path
-import jsonschema
+from hashlib import blake2b
+from uuid import uuid4
+import fastjsonschema
 from enum import Enum
+from types import MappingProxyType
+from watchdog.events import PatternMatchingEventHandler
+from watchdog.observers import Observer
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader, SafeDumper
+
+# Generated validators shared across managers, keyed by canonical schema text
+_VALIDATOR_CACHE: Dict[bytes, Callable[[Dict], Dict]] = {}
+
+def _compiled_validator(schema: Dict) -> Callable[[Dict], Dict]:
+    """Return a cached fastjsonschema validator for a schema, generating it on first use."""
+    key = orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)
+    validator = _VALIDATOR_CACHE.get(key)
+    if validator is None:
+        validator = _VALIDATOR_CACHE.setdefault(key, fastjsonschema.compile(schema))
+    return validator
+
+def _content_digest(content: bytes) -> bytes:
+    """Digest of a configuration file's bytes, used to skip identical rewrites."""
+    return blake2b(content, digest_size=16).digest()
+
+# Schema keywords whose checks span several properties; such schemas are always validated whole
+_CROSS_FIELD_KEYWORDS = frozenset({
+    'allOf', 'anyOf', 'oneOf', 'not', 'if', 'dependencies', 'dependentRequired',
+    'dependentSchemas', 'patternProperties', 'propertyNames', 'minProperties', 'maxProperties'
+})
+
+def _field_validators(schema: Dict) -> Optional[Dict[str, Callable[[Dict], Dict]]]:
+    """Per-property validators for an object schema, or None if it has cross-field constraints."""
+    if _CROSS_FIELD_KEYWORDS & schema.keys() or b'"$ref"' in orjson.dumps(schema):
+        return None
+    return {
+        field: _compiled_validator(subschema)
+        for field, subschema in schema.get('properties', {}).items()
+    }
 
 class ConfigType(Enum):
     SYSTEM = "system"
@@ -16,7 +57,26 @@ class ConfigType(Enum):
     EXECUTION = "execution"
     MONITORING = "monitoring"
 
-@dataclass
+# Static range and required-field rules, shared read-only across managers
+_VALIDATION_RULES = MappingProxyType({
+    ConfigType.SYSTEM: {
+        'required_fields': ['env', 'debug_mode', 'log_level'],
+        'value_ranges': {
+            'max_memory_usage': (0.0, 1.0),
+            'max_cpu_usage': (0.0, 1.0)
+        }
+    },
+    ConfigType.RISK: {
+        'required_fields': ['max_position_size', 'max_portfolio_risk'],
+        'value_ranges': {
+            'max_position_size': (0.0, 1.0),
+            'max_portfolio_risk': (0.0, 1.0),
+            'max_leverage': (1.0, 10.0)
+        }
+    }
+})
+
+@dataclass(slots=True)
 class SystemConfig:
     env: str  # 'development', 'staging', 'production'
     debug_mode: bool
@@ -25,7 +85,7 @@ class SystemConfig:
     max_cpu_usage: float
     data_retention_days: int
 
-@dataclass
+@dataclass(slots=True)
 class AgentConfig:
     name: str
     enabled: bool
@@ -34,7 +94,7 @@ class AgentConfig:
     max_positions: int
     parameters: Dict
 
-@dataclass
+@dataclass(slots=True)
 class RiskConfig:
     max_position_size: float
     max_portfolio_risk: float
@@ -43,7 +103,7 @@ class RiskConfig:
     max_sector_exposure: float
     emergency_cash_buffer: float
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionConfig:
     max_slippage: float
     min_fill_rate: float
@@ -51,13 +111,35 @@ class ExecutionConfig:
     retry_attempts: int
     order_types: List[str]
 
-@dataclass
+@dataclass(slots=True)
 class MonitoringConfig:
     alert_levels: Dict[str, float]
     metrics_interval: float
     health_check_interval: float
     log_retention_days: int
 
+class _ConfigFileHandler(PatternMatchingEventHandler):
+    """Forwards YAML file events from the watchdog thread to the manager's event loop."""
+    
+    def __init__(self, manager: "ConfigurationManager", loop: asyncio.AbstractEventLoop):
+        super().__init__(patterns=["*.yaml"], ignore_directories=True)
+        self.manager = manager
+        self.loop = loop
+        
+    def on_created(self, event):
+        self._schedule_reload(event.src_path)
+        
+    def on_modified(self, event):
+        self._schedule_reload(event.src_path)
+        
+    def on_moved(self, event):
+        # Renames away from *.yaml (e.g. backups) also match on their source path
+        if event.dest_path.endswith(".yaml"):
+            self._schedule_reload(event.dest_path)
+        
+    def _schedule_reload(self, path: str):
+        asyncio.run_coroutine_threadsafe(self.manager._reload_configuration(Path(path)), self.loop)
+
 class ConfigurationManager:
     """
     Configuration Manager for handling system-wide settings and parameters.
@@ -70,21 +152,34 @@ class ConfigurationManager:
         
         # Configuration Storage
         self.configurations = {}
+        self.schemas = {}
         self.schema_validators = {}
+        self.field_validators = {}
         self.active_subscriptions = {}
+        self._subscriber_callbacks = {}  # config key -> tuple of callbacks, rebuilt on subscribe
         
         # Change Tracking
         self.config_history = {}
         self.pending_changes = {}
+        self._file_signatures = {}  # config key -> (mtime, size) last seen on disk
+        self._file_digests = {}  # config key -> digest of the YAML last read or written
+        self._config_types = {config_type.value: config_type for config_type in ConfigType}
+        self.change_observer = None
+        
+        # Persistence: updates are coalesced for save_delay seconds before writing
+        self.save_delay = 0.05
+        self.max_backups = 1
+        self._save_requested = asyncio.Event()
+        self.config_writer = None
         
         # Validation Rules
-        self.validation_rules = self._load_validation_rules()
+        self.validation_rules = _VALIDATION_RULES
         
     async def initialize(self) -> bool:
         """Initialize the Configuration Manager."""
         try:
             # Create config directory if it doesn't exist
-            self.config_dir.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(self.config_dir.mkdir, parents=True, exist_ok=True)
             
             # Load schemas
             await self._load_schemas()
@@ -93,9 +188,14 @@ class ConfigurationManager:
             await self._load_configurations()
             
             # Initialize change monitoring
-            self.change_monitor = asyncio.create_task(
-                self._monitor_configuration_changes()
+            self.change_observer = Observer()
+            self.change_observer.schedule(
+                _ConfigFileHandler(self, asyncio.get_running_loop()), str(self.config_dir)
             )
+            self.change_observer.start()
+            
+            # Start the batched configuration writer
+            self.config_writer = asyncio.create_task(self._write_pending_configurations())
             
             self.logger.info("Configuration Manager initialized successfully")
             return True
@@ -125,18 +225,20 @@ class ConfigurationManager:
         try:
             config_key = f"{config_type.value}.{component}" if component else config_type.value
             
-            # Validate updates
-            if not await self._validate_config(config_type, updates):
-                raise ValueError("Invalid configuration updates")
-            
             # Store current config for rollback
             current_config = self.configurations.get(config_key, {})
             
-            # Apply updates
-            new_config = {**current_config, **updates}
+            # Apply updates to a shallow copy
+            new_config = current_config.copy()
+            new_config.update(updates)
             
-            # Validate complete configuration
-            if not await self._validate_config(config_type, new_config):
+            # Validate the changed fields, or the complete configuration when needed
+            field_validators = self.field_validators.get(config_type.value)
+            if config_key in self.configurations and field_validators is not None \
+                    and field_validators.keys() >= updates.keys():
+                if not await self._validate_fields(field_validators, updates):
+                    raise ValueError("Invalid configuration updates")
+            elif not await self._validate_config(config_type, new_config):
                 raise ValueError("Invalid resulting configuration")
             
             # Store update
@@ -148,8 +250,9 @@ class ConfigurationManager:
             # Notify subscribers
             await self._notify_config_change(config_key, new_config)
             
-            # Persist changes
-            await self._save_configuration(config_key)
+            # Persist changes in the next batched write
+            self.pending_changes[config_key] = new_config
+            self._save_requested.set()
             
             return True
             
@@ -161,13 +264,14 @@ class ConfigurationManager:
                                  callback: callable, component: str = None) -> str:
         """Subscribe to configuration changes."""
         try:
-            subscription_id = f"{datetime.now().timestamp()}"
+            subscription_id = uuid4().hex
             config_key = f"{config_type.value}.{component}" if component else config_type.value
             
             if config_key not in self.active_subscriptions:
                 self.active_subscriptions[config_key] = {}
             
             self.active_subscriptions[config_key][subscription_id] = callback
+            self._subscriber_callbacks[config_key] = tuple(self.active_subscriptions[config_key].values())
             
             return subscription_id
             
@@ -179,10 +283,11 @@ class ConfigurationManager:
         """Load JSON schemas for configuration validation."""
         try:
             schema_dir = self.config_dir / "schemas"
-            for schema_file in schema_dir.glob("*.json"):
-                with open(schema_file) as f:
-                    schema = json.load(f)
-                    self.schema_validators[schema_file.stem] = jsonschema.Draft7Validator(schema)
+            schemas = await asyncio.to_thread(self._read_schemas, schema_dir)
+            for schema_type, schema in schemas.items():
+                self.schemas[schema_type] = schema
+                self.schema_validators[schema_type] = _compiled_validator(schema)
+                self.field_validators[schema_type] = _field_validators(schema)
                     
         except Exception as e:
             self.logger.error(f"Schema loading failed: {str(e)}")
@@ -191,20 +296,40 @@ class ConfigurationManager:
     async def _load_configurations(self):
         """Load configurations from files."""
         try:
-            for config_file in self.config_dir.glob("*.yaml"):
-                with open(config_file) as f:
-                    config = yaml.safe_load(f)
-                    config_type = config_file.stem
-                    
-                    if await self._validate_config(ConfigType(config_type), config):
-                        self.configurations[config_type] = config
-                    else:
-                        raise ValueError(f"Invalid configuration in {config_file}")
+            configs = await asyncio.to_thread(self._read_configurations)
+            for config_key, (config, digest), signature in configs:
+                if await self._validate_config(self._config_type(config_key), config):
+                    self.configurations[config_key] = config
+                    self._file_signatures[config_key] = signature
+                    self._file_digests[config_key] = digest
+                else:
+                    raise ValueError(f"Invalid configuration in {config_key}.yaml")
                         
         except Exception as e:
             self.logger.error(f"Configuration loading failed: {str(e)}")
             raise
 
+    @staticmethod
+    def _read_schemas(schema_dir: Path) -> Dict[str, Dict]:
+        """Read every JSON schema in a directory."""
+        schemas = {}
+        for schema_file in schema_dir.glob("*.json"):
+            with open(schema_file, 'rb') as f:
+                schemas[schema_file.stem] = orjson.loads(f.read())
+        return schemas
+
+    def _read_configurations(self) -> List[Tuple[str, Tuple[Dict, bytes], Tuple[float, int]]]:
+        """Read every recognised YAML configuration with its digest and (mtime, size) signature."""
+        return [
+            (config_file.stem, self._read_yaml(config_file), self._file_signature(config_file))
+            for config_file in self.config_dir.glob("*.yaml")
+            if self._config_type(config_file.stem) is not None
+        ]
+
+    def _config_type(self, config_key: str) -> Optional[ConfigType]:
+        """ConfigType of a '<type>' or '<type>.<component>' key, or None if unrecognised."""
+        return self._config_types.get(config_key.partition('.')[0])
+
     async def _validate_config(self, config_type: ConfigType, config: Dict) -> bool:
         """Validate configuration against schema."""
         try:
@@ -212,107 +337,155 @@ class ConfigurationManager:
             if not validator:
                 raise ValueError(f"No validator found for {config_type.value}")
             
-            validator.validate(config)
+            validator(config)
+            return True
+            
+        except fastjsonschema.JsonSchemaException as e:
+            self.logger.error(f"Configuration validation failed: {e.message} (rule: {e.rule})")
+            return False
+
+    async def _write_pending_configurations(self):
+        """Flush pending configuration changes, coalescing updates within save_delay."""
+        while True:
+            await self._save_requested.wait()
+            await asyncio.sleep(self.save_delay)
+            self._save_requested.clear()
+            await self._flush_pending_changes()
+
+    async def _flush_pending_changes(self):
+        """Save pending changes, dropping each key only once its save succeeds."""
+        for config_key, config in list(self.pending_changes.items()):
+            try:
+                await self._save_configuration(config_key)
+            except Exception:
+                # Keep the change pending for the next flush or shutdown
+                continue
+            # A newer update that arrived during the save stays pending
+            if self.pending_changes.get(config_key) is config:
+                del self.pending_changes[config_key]
+
+    async def _validate_fields(self, field_validators: Dict[str, Callable[[Dict], Dict]],
+                               updates: Dict) -> bool:
+        """Validate updated fields against their property subschemas."""
+        try:
+            for field, value in updates.items():
+                field_validators[field](value)
             return True
             
-        except jsonschema.exceptions.ValidationError as e:
-            self.logger.error(f"Configuration validation failed: {str(e)}")
+        except fastjsonschema.JsonSchemaException as e:
+            self.logger.error(f"Configuration validation failed for {field}: {e.message} (rule: {e.rule})")
             return False
 
     async def _save_configuration(self, config_key: str):
         """Persist configuration changes to file."""
         try:
-            config_file = self.config_dir / f"{config_key}.yaml"
-            config_data = self.configurations[config_key]
+            content = yaml.dump(self.configurations[config_key], Dumper=SafeDumper).encode()
             
-            # Create backup
-            if config_file.exists():
-                backup_file = config_file.with_suffix(f".bak.{datetime.now().timestamp()}")
-                config_file.rename(backup_file)
+            # Nothing to write (or back up) if the file already holds this content
+            digest = _content_digest(content)
+            if self._file_digests.get(config_key) == digest:
+                return
             
-            # Save new configuration
-            with open(config_file, 'w') as f:
-                yaml.safe_dump(config_data, f)
+            self._file_signatures[config_key] = await asyncio.to_thread(
+                self._write_configuration_file, config_key, content
+            )
+            self._file_digests[config_key] = digest
                 
         except Exception as e:
             self.logger.error(f"Configuration save failed: {str(e)}")
             raise
 
+    def _write_configuration_file(self, config_key: str, content: bytes) -> Tuple[float, int]:
+        """Write a configuration atomically with a backup, returning its new signature."""
+        config_file = self.config_dir / f"{config_key}.yaml"
+        
+        if config_file.exists():
+            # Hard-link the current file as a backup, keeping only the newest max_backups
+            backup_file = config_file.with_suffix(f".bak.{datetime.now().timestamp()}")
+            os.link(config_file, backup_file)
+            backups = sorted(self.config_dir.glob(f"{config_key}.bak.*"),
+                             key=lambda path: path.stat().st_mtime)
+            for old_backup in backups[:-self.max_backups]:
+                old_backup.unlink()
+        
+        # Save new configuration atomically
+        temp_file = config_file.with_suffix(".yaml.tmp")
+        temp_file.write_bytes(content)
+        os.replace(temp_file, config_file)
+        return self._file_signature(config_file)
+
     async def _notify_config_change(self, config_key: str, new_config: Dict):
         """Notify subscribers of configuration changes."""
         try:
-            subscribers = self.active_subscriptions.get(config_key, {})
+            callbacks = self._subscriber_callbacks.get(config_key, ())
             
-            for callback in subscribers.values():
+            async def _call(callback):
+                # Isolate each subscriber: a raising or synchronous callback can't fail the others
                 try:
-                    await callback(new_config)
+                    result = callback(new_config)
+                    if asyncio.iscoroutine(result):
+                        await result
                 except Exception as e:
                     self.logger.error(f"Subscriber notification failed: {str(e)}")
+            
+            # Fan out to all subscribers concurrently
+            await asyncio.gather(*(_call(callback) for callback in callbacks))
                     
         except Exception as e:
             self.logger.error(f"Change notification failed: {str(e)}")
 
-    async def _monitor_configuration_changes(self):
-        """Monitor for configuration file changes."""
-        while True:
-            try:
-                # Check for file changes
-                for config_file in self.config_dir.glob("*.yaml"):
-                    last_modified = config_file.stat().st_mtime
-                    stored_time = self.config_history.get(config_file.stem, 0)
-                    
-                    if last_modified > stored_time:
-                        # Reload configuration
-                        with open(config_file) as f:
-                            new_config = yaml.safe_load(f)
-                            
-                        if await self._validate_config(
-                            ConfigType(config_file.stem), new_config
-                        ):
-                            self.configurations[config_file.stem] = new_config
-                            self.config_history[config_file.stem] = last_modified
-                            
-                            # Notify subscribers
-                            await self._notify_config_change(
-                                config_file.stem, new_config
-                            )
+    async def _reload_configuration(self, config_file: Path):
+        """Reload a configuration file if its contents changed on disk."""
+        try:
+            config_key = config_file.stem
+            config_type = self._config_type(config_key)
+            if config_type is None:
+                return
+            
+            # Skip events for files we already hold (including our own saves)
+            signature = await asyncio.to_thread(self._file_signature, config_file)
+            if self._file_signatures.get(config_key) == signature:
+                return
+            self._file_signatures[config_key] = signature
+            
+            new_config, self._file_digests[config_key] = await asyncio.to_thread(self._read_yaml, config_file)
+            if await self._validate_config(config_type, new_config):
+                self.configurations[config_key] = new_config
                 
-                await asyncio.sleep(1)  # Check every second
+                # Notify subscribers
+                await self._notify_config_change(config_key, new_config)
                 
-            except Exception as e:
-                self.logger.error(f"Configuration monitoring failed: {str(e)}")
-                await asyncio.sleep(5)  # Back off on error
-
-    def _load_validation_rules(self) -> Dict:
-        """Load validation rules for configurations."""
-        return {
-            ConfigType.SYSTEM: {
-                'required_fields': ['env', 'debug_mode', 'log_level'],
-                'value_ranges': {
-                    'max_memory_usage': (0.0, 1.0),
-                    'max_cpu_usage': (0.0, 1.0)
-                }
-            },
-            ConfigType.RISK: {
-                'required_fields': ['max_position_size', 'max_portfolio_risk'],
-                'value_ranges': {
-                    'max_position_size': (0.0, 1.0),
-                    'max_portfolio_risk': (0.0, 1.0),
-                    'max_leverage': (1.0, 10.0)
-                }
-            }
-        }
+        except Exception as e:
+            self.logger.error(f"Configuration reload failed for {config_file.name}: {str(e)}")
+
+    @staticmethod
+    def _file_signature(path: Path) -> Tuple[float, int]:
+        """(mtime, size) of a file, used to skip unchanged configurations."""
+        stat = path.stat()
+        return stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def _read_yaml(path: Path) -> Tuple[Dict, bytes]:
+        """Parse a YAML file, returning it with the digest of its bytes."""
+        with open(path, 'rb') as f:
+            content = f.read()
+        return yaml.load(content, Loader=SafeLoader), _content_digest(content)
 
     async def shutdown(self):
         """Clean shutdown of the Configuration Manager."""
         try:
-            # Cancel monitoring task
-            if self.change_monitor:
-                self.change_monitor.cancel()
+            # Stop file system monitoring
+            if self.change_observer:
+                self.change_observer.stop()
+                await asyncio.to_thread(self.change_observer.join)
             
-            # Save any pending changes
-            for config_key in self.pending_changes:
-                await self._save_configuration(config_key)
+            # Stop the writer and save any pending changes
+            if self.config_writer:
+                self.config_writer.cancel()
+                await asyncio.gather(self.config_writer, return_exceptions=True)
+            await self._flush_pending_changes()
+            if self.pending_changes:
+                self.logger.error(f"Unsaved configuration changes: {', '.join(self.pending_changes)}")
             
             self.logger.info("Configuration Manager shut down successfully")
             
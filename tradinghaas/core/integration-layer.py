@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from typing import Dict, List, Optional, Any, Callable
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
 import uuid
 
@@ -17,6 +17,9 @@ class MessageType(Enum):
     SYSTEM = "SYSTEM"
     CONTROL = "CONTROL"
 
+# Dense index of each message type into the per-type routing tables
+_TYPE_INDEX = {message_type: i for i, message_type in enumerate(MessageType)}
+
 class MessagePriority(Enum):
     HIGH = 0
     MEDIUM = 1
@@ -34,6 +37,19 @@ class Message:
     correlation_id: Optional[str] = None
     metadata: Optional[Dict] = None
 
+@dataclass
+class Subscription:
+    id: str
+    callback: Callable
+    filter: Optional[Dict]
+    matches: Callable[[Message], bool]
+
+@dataclass
+class TokenBucket:
+    rate: float
+    tokens: float
+    updated: float
+
 class IntegrationLayer:
     """
     Integration Layer for coordinating system-wide communication and data flow.
@@ -45,12 +61,17 @@ class IntegrationLayer:
         
         # Message Queues
         self.message_queues = {
-            priority: asyncio.PriorityQueue() 
+            priority: deque()
             for priority in MessagePriority
         }
+        self._ordered_queues = [
+            self.message_queues[priority]
+            for priority in sorted(MessagePriority, key=lambda p: p.value)
+        ]
+        self._message_ready = asyncio.Event()
         
         # Subscriptions
-        self.subscriptions = defaultdict(set)
+        self.subscriptions = [[] for _ in MessageType]
         
         # Event Handlers
         self.event_handlers = defaultdict(list)
@@ -59,7 +80,7 @@ class IntegrationLayer:
         self.active_sessions = {}
         
         # Message Statistics
-        self.message_stats = defaultdict(int)
+        self.message_stats = [0] * len(MessageType)
         
         # Flow Control
         self.rate_limits = {
@@ -75,17 +96,15 @@ class IntegrationLayer:
     async def initialize(self) -> bool:
         """Initialize the Integration Layer."""
         try:
-            # Start message processors
-            self.processors = {
-                priority: asyncio.create_task(self._process_message_queue(priority))
-                for priority in MessagePriority
-            }
+            # Start message processor
+            self.processor = asyncio.create_task(self._process_message_queue())
             
             # Initialize rate limiters
-            self.rate_limiters = {
-                msg_type: asyncio.Semaphore(limit)
-                for msg_type, limit in self.rate_limits.items()
-            }
+            now = asyncio.get_running_loop().time()
+            self.rate_limiters = [
+                TokenBucket(rate=float(limit), tokens=float(limit), updated=now)
+                for limit in (self.rate_limits[msg_type] for msg_type in MessageType)
+            ]
             
             self.logger.info("Integration Layer initialized successfully")
             return True
@@ -106,16 +125,16 @@ class IntegrationLayer:
                 message.timestamp = datetime.now()
             
             # Apply rate limiting
-            async with self.rate_limiters[message.type]:
-                # Add to appropriate queue
-                await self.message_queues[message.priority].put(
-                    (message.priority.value, message)
-                )
-                
-                # Update statistics
-                self.message_stats[message.type] += 1
-                
-                return True
+            await self._acquire_rate_token(message.type)
+            
+            # Add to appropriate queue
+            self.message_queues[message.priority].append(message)
+            self._message_ready.set()
+            
+            # Update statistics
+            self.message_stats[_TYPE_INDEX[message.type]] += 1
+            
+            return True
                 
         except Exception as e:
             self.logger.error(f"Message publication failed: {str(e)}")
@@ -127,73 +146,84 @@ class IntegrationLayer:
         try:
             subscription_id = str(uuid.uuid4())
             
-            self.subscriptions[message_type].add({
-                'id': subscription_id,
-                'callback': callback,
-                'filter': filter_criteria
-            })
+            self.subscriptions[_TYPE_INDEX[message_type]].append(Subscription(
+                id=subscription_id,
+                callback=callback,
+                filter=filter_criteria,
+                matches=self._compile_filter(filter_criteria)
+            ))
             
-            self.logger.info(f"New subscription added for {message_type.value}")
+            self.logger.info(f"New subscription added for {message_type.name}")
             return subscription_id
             
         except Exception as e:
             self.logger.error(f"Subscription failed: {str(e)}")
             return None
 
-    async def _process_message_queue(self, priority: MessagePriority):
-        """Process messages from a specific priority queue."""
+    async def _acquire_rate_token(self, message_type: MessageType):
+        """Take one token from the message type's bucket, waiting for a refill if empty."""
+        bucket = self.rate_limiters[_TYPE_INDEX[message_type]]
+        loop = asyncio.get_running_loop()
         while True:
-            try:
-                # Get message from queue
-                _, message = await self.message_queues[priority].get()
-                
-                # Process message
-                await self._route_message(message)
-                
-                # Mark task as done
-                self.message_queues[priority].task_done()
-                
-            except Exception as e:
-                self.logger.error(f"Message processing failed: {str(e)}")
-                await asyncio.sleep(0.1)
+            now = loop.time()
+            bucket.tokens = min(bucket.rate, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            if bucket.tokens >= 1.0:
+                bucket.tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - bucket.tokens) / bucket.rate)
+
+    async def _process_message_queue(self):
+        """Process queued messages, always draining the highest priority first."""
+        while True:
+            await self._message_ready.wait()
+            self._message_ready.clear()
+            
+            # Drain all queues, highest priority first
+            while (queue := next((q for q in self._ordered_queues if q), None)) is not None:
+                message = queue.popleft()
+                try:
+                    await self._route_message(message)
+                except Exception as e:
+                    self.logger.error(f"Message processing failed: {str(e)}")
 
     async def _route_message(self, message: Message):
         """Route message to appropriate subscribers."""
         try:
             # Get subscribers for message type
-            subscribers = self.subscriptions[message.type]
+            subscribers = self.subscriptions[_TYPE_INDEX[message.type]]
             
             # Route to each subscriber
             for subscriber in subscribers:
-                if self._matches_filter(message, subscriber['filter']):
-                    try:
-                        await subscriber['callback'](message)
-                    except Exception as e:
-                        self.logger.error(f"Subscriber callback failed: {str(e)}")
+                try:
+                    if subscriber.matches(message):
+                        await subscriber.callback(message)
+                except Exception as e:
+                    self.logger.error(f"Subscriber callback failed: {str(e)}")
                         
         except Exception as e:
             self.logger.error(f"Message routing failed: {str(e)}")
 
-    def _matches_filter(self, message: Message, filter_criteria: Optional[Dict]) -> bool:
-        """Check if message matches filter criteria."""
+    def _compile_filter(self, filter_criteria: Optional[Dict]) -> Callable[[Message], bool]:
+        """Compile filter criteria once into a predicate over messages."""
         if not filter_criteria:
-            return True
-            
-        try:
-            for key, value in filter_criteria.items():
-                if key in message.metadata:
-                    if message.metadata[key] != value:
-                        return False
-                elif key in message.payload:
-                    if message.payload[key] != value:
-                        return False
-                else:
+            return lambda message: True
+        
+        criteria = tuple(filter_criteria.items())
+        missing = object()
+        
+        def matches(message: Message) -> bool:
+            # Metadata takes precedence over payload for each key
+            metadata = message.metadata or {}
+            for key, value in criteria:
+                actual = metadata.get(key, missing)
+                if actual is missing:
+                    actual = message.payload.get(key, missing)
+                if actual is missing or actual != value:
                     return False
             return True
-            
-        except Exception as e:
-            self.logger.error(f"Filter matching failed: {str(e)}")
-            return False
+        
+        return matches
 
     async def register_event_handler(self, event_type: str, 
                                    handler: Callable) -> str:
@@ -249,15 +279,18 @@ class IntegrationLayer:
         """Get integration layer metrics."""
         try:
             return {
-                'message_counts': dict(self.message_stats),
+                'message_counts': {
+                    msg_type.name: self.message_stats[_TYPE_INDEX[msg_type]]
+                    for msg_type in MessageType
+                },
                 'queue_sizes': {
-                    priority.name: queue.qsize() 
+                    priority.name: len(queue)
                     for priority, queue in self.message_queues.items()
                 },
                 'active_sessions': len(self.active_sessions),
                 'subscription_counts': {
-                    msg_type.name: len(subs) 
-                    for msg_type, subs in self.subscriptions.items()
+                    msg_type.name: len(self.subscriptions[_TYPE_INDEX[msg_type]])
+                    for msg_type in MessageType
                 }
             }
             
@@ -268,17 +301,16 @@ class IntegrationLayer:
     async def shutdown(self):
         """Clean shutdown of the Integration Layer."""
         try:
-            # Cancel message processors
-            for processor in self.processors.values():
-                processor.cancel()
+            # Cancel message processor
+            self.processor.cancel()
             
             # Clear queues
             for queue in self.message_queues.values():
-                while not queue.empty():
-                    await queue.get()
+                queue.clear()
             
             # Clear subscriptions and handlers
-            self.subscriptions.clear()
+            for subscribers in self.subscriptions:
+                subscribers.clear()
             self.event_handlers.clear()
             
             self.logger.info("Integration Layer shut down successfully")
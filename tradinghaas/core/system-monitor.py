@@ -1,12 +1,23 @@
 import asyncio
 import logging
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Dict, List, Optional, Set
 import psutil
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
+from operator import attrgetter, itemgetter
+
+# Bound once for the sampling loop
+_cpu_percent = psutil.cpu_percent
+_virtual_memory = psutil.virtual_memory
+_disk_usage = psutil.disk_usage
+
+def ts_to_dt(timestamp_ns: int) -> datetime:
+    """Convert a time.time_ns() timestamp to a local datetime for display."""
+    return datetime.fromtimestamp(timestamp_ns / 1e9)
 
 class AlertLevel(Enum):
     INFO = "INFO"
@@ -20,7 +31,7 @@ class MetricType(Enum):
     EXECUTION = "EXECUTION"
     PERFORMANCE = "PERFORMANCE"
 
-@dataclass
+@dataclass(slots=True)
 class SystemMetrics:
     cpu_usage: float
     memory_usage: float
@@ -29,14 +40,14 @@ class SystemMetrics:
     message_queue_size: int
     active_agents: int
     error_count: int
-    timestamp: datetime
+    timestamp_ns: int  # time.time_ns() at sampling
 
-@dataclass
+@dataclass(slots=True)
 class Alert:
     level: AlertLevel
     source: str
     message: str
-    timestamp: datetime
+    timestamp_ns: int  # time.time_ns() when raised
     metric_type: MetricType
     value: float
     threshold: float
@@ -50,6 +61,12 @@ class SystemMonitor:
     
     def __init__(self):
         self.logger = logging.getLogger("SystemMonitor")
+        self._alert_log = {
+            AlertLevel.CRITICAL: self.logger.critical,
+            AlertLevel.ERROR: self.logger.error,
+            AlertLevel.WARNING: self.logger.warning,
+            AlertLevel.INFO: self.logger.info
+        }
         
         # Monitoring Thresholds
         self.thresholds = {
@@ -62,16 +79,34 @@ class SystemMonitor:
             'execution_latency': 500.0  # 500ms execution latency
         }
         
+        # System metrics checked against thresholds on every sample
+        self._system_alerts = (
+            ('cpu_usage', "High CPU usage: {}%"),
+            ('memory_usage', "High memory usage: {}%")
+        )
+        self._system_alert_values = attrgetter(*(name for name, _ in self._system_alerts))
+        self._system_alert_thresholds = itemgetter(*(name for name, _ in self._system_alerts))
+        
         # Performance Tracking
-        self.metrics_history = defaultdict(list)
+        self.history_size = 1000
+        self.metrics_history = defaultdict(lambda: deque(maxlen=self.history_size))
         self.alerts_history = []
         self.active_alerts = set()
         
+        # Running averages over roughly the last 100 samples
+        self.ewma_window = 100
+        self._sys_ewma_alpha = 2 / (self.ewma_window + 1)
+        self._sys_ewma = {'cpu_usage': 0.0, 'memory_usage': 0.0, 'network_latency': 0.0}
+        
         # System State
         self.system_state = {}
         self.agent_states = {}
         self.component_health = {}
         
+        # Disk fill changes slowly; sample it at most once per refresh interval
+        self.disk_refresh_interval = 60.0
+        self._disk_cache = (float('-inf'), 0.0)  # (monotonic time, percent)
+        
         # Monitoring Intervals
         self.monitoring_intervals = {
             MetricType.SYSTEM: 5,  # 5 seconds
@@ -106,19 +141,23 @@ class SystemMonitor:
         while True:
             try:
                 metrics = SystemMetrics(
-                    cpu_usage=psutil.cpu_percent(),
-                    memory_usage=psutil.virtual_memory().percent,
-                    disk_usage=psutil.disk_usage('/').percent,
+                    cpu_usage=_cpu_percent(interval=None),
+                    memory_usage=_virtual_memory().percent,
+                    disk_usage=self._get_disk_usage(),
                     network_latency=await self._measure_network_latency(),
                     message_queue_size=await self._get_queue_size(),
                     active_agents=len(self.agent_states),
                     error_count=len(self.active_alerts),
-                    timestamp=datetime.now()
+                    timestamp_ns=time.time_ns()
                 )
                 
                 await self._process_system_metrics(metrics)
                 await asyncio.sleep(self.monitoring_intervals[MetricType.SYSTEM])
                 
+            except (psutil.Error, OSError) as e:
+                self.logger.error(f"System metrics sampling failed: {str(e)}")
+                await asyncio.sleep(1)
+                
             except Exception as e:
                 self.logger.error(f"System metrics monitoring failed: {str(e)}")
                 await asyncio.sleep(1)
@@ -147,78 +186,68 @@ class SystemMonitor:
                 self.logger.error(f"Execution metrics monitoring failed: {str(e)}")
                 await asyncio.sleep(1)
 
+    def _get_disk_usage(self) -> float:
+        """Root filesystem usage percent, refreshed at most once per disk_refresh_interval."""
+        checked_at, percent = self._disk_cache
+        now = time.monotonic()
+        if now - checked_at > self.disk_refresh_interval:
+            percent = _disk_usage('/').percent
+            self._disk_cache = (now, percent)
+        return percent
+
     async def _process_system_metrics(self, metrics: SystemMetrics):
         """Process and analyze system metrics."""
-        try:
-            # Check CPU usage
-            if metrics.cpu_usage > self.thresholds['cpu_usage']:
-                await self._generate_alert(
-                    AlertLevel.WARNING,
-                    "System",
-                    f"High CPU usage: {metrics.cpu_usage}%",
-                    MetricType.SYSTEM,
-                    metrics.cpu_usage,
-                    self.thresholds['cpu_usage']
-                )
-            
-            # Check memory usage
-            if metrics.memory_usage > self.thresholds['memory_usage']:
-                await self._generate_alert(
-                    AlertLevel.WARNING,
-                    "System",
-                    f"High memory usage: {metrics.memory_usage}%",
-                    MetricType.SYSTEM,
-                    metrics.memory_usage,
-                    self.thresholds['memory_usage']
-                )
-            
-            # Update metrics history
-            self.metrics_history[MetricType.SYSTEM].append(metrics)
-            
-            # Trim history if needed
-            if len(self.metrics_history[MetricType.SYSTEM]) > 1000:
-                self.metrics_history[MetricType.SYSTEM] = self.metrics_history[MetricType.SYSTEM][-1000:]
-                
-        except Exception as e:
-            self.logger.error(f"System metrics processing failed: {str(e)}")
+        # Check all thresholds in one comparison against their current values;
+        # format messages only for breaches
+        values = self._system_alert_values(metrics)
+        thresholds = self._system_alert_thresholds(self.thresholds)
+        for i in np.flatnonzero(np.array(values) > np.array(thresholds)):
+            _, message = self._system_alerts[i]
+            await self._generate_alert(
+                AlertLevel.WARNING,
+                "System",
+                message.format(values[i]),
+                MetricType.SYSTEM,
+                values[i],
+                thresholds[i]
+            )
+        
+        # Update running averages, seeding them with the first sample
+        system_history = self.metrics_history[MetricType.SYSTEM]
+        alpha = self._sys_ewma_alpha if system_history else 1.0
+        for name, average in self._sys_ewma.items():
+            self._sys_ewma[name] = average + alpha * (getattr(metrics, name) - average)
+        
+        # Update metrics history
+        system_history.append(metrics)
 
     async def _generate_alert(self, level: AlertLevel, source: str, message: str,
                             metric_type: MetricType, value: float, threshold: float):
         """Generate and process system alerts."""
-        try:
-            alert = Alert(
-                level=level,
-                source=source,
-                message=message,
-                timestamp=datetime.now(),
-                metric_type=metric_type,
-                value=value,
-                threshold=threshold,
-                metadata={}
-            )
-            
-            # Add to active alerts
-            alert_key = f"{source}:{message}"
-            self.active_alerts.add(alert_key)
-            
-            # Add to history
-            self.alerts_history.append(alert)
-            
-            # Log alert
-            self.logger.log(
-                logging.CRITICAL if level == AlertLevel.CRITICAL else
-                logging.ERROR if level == AlertLevel.ERROR else
-                logging.WARNING if level == AlertLevel.WARNING else
-                logging.INFO,
-                f"Alert: {message}"
-            )
-            
-            # Take immediate action for critical alerts
-            if level == AlertLevel.CRITICAL:
-                await self._handle_critical_alert(alert)
-                
-        except Exception as e:
-            self.logger.error(f"Alert generation failed: {str(e)}")
+        alert = Alert(
+            level=level,
+            source=source,
+            message=message,
+            timestamp_ns=time.time_ns(),
+            metric_type=metric_type,
+            value=value,
+            threshold=threshold,
+            metadata={}
+        )
+        
+        # Add to active alerts
+        alert_key = f"{source}:{message}"
+        self.active_alerts.add(alert_key)
+        
+        # Add to history
+        self.alerts_history.append(alert)
+        
+        # Log alert
+        self._alert_log[level]("Alert: %s", message)
+        
+        # Take immediate action for critical alerts
+        if level == AlertLevel.CRITICAL:
+            await self._handle_critical_alert(alert)
 
     async def _handle_critical_alert(self, alert: Alert):
         """Handle critical system alerts."""
@@ -240,8 +269,11 @@ class SystemMonitor:
     async def get_system_health(self) -> Dict:
         """Get current system health status."""
         try:
+            system_metrics = asdict(self.metrics_history[MetricType.SYSTEM][-1])
+            system_metrics['timestamp'] = ts_to_dt(system_metrics.pop('timestamp_ns'))
+            
             return {
-                'system_metrics': self.metrics_history[MetricType.SYSTEM][-1].__dict__,
+                'system_metrics': system_metrics,
                 'active_alerts': len(self.active_alerts),
                 'component_health': self.component_health,
                 'agent_states': self.agent_states,
@@ -258,9 +290,9 @@ class SystemMonitor:
         try:
             return {
                 'system_performance': {
-                    'cpu_usage_avg': np.mean([m.cpu_usage for m in self.metrics_history[MetricType.SYSTEM][-100:]]),
-                    'memory_usage_avg': np.mean([m.memory_usage for m in self.metrics_history[MetricType.SYSTEM][-100:]]),
-                    'network_latency_avg': np.mean([m.network_latency for m in self.metrics_history[MetricType.SYSTEM][-100:]])
+                    'cpu_usage_avg': self._sys_ewma['cpu_usage'],
+                    'memory_usage_avg': self._sys_ewma['memory_usage'],
+                    'network_latency_avg': self._sys_ewma['network_latency']
                 },
                 'trading_performance': await self._get_trading_performance(),
                 'execution_performance': await self._get_execution_performance(),
@@ -1,17 +1,28 @@
 import asyncio
 import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
+from functools import partial
+from hashlib import blake2b
+from time import monotonic
 from typing import Dict, List, Optional, Union
-import pandas as pd
 import numpy as np
-import aioredis
+import orjson
+from redis.asyncio import ConnectionPool, Redis
 import motor.motor_asyncio
 from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
 import clickhouse_driver
 import aiofiles
 
+# orjson options for cache payloads: numpy values, naive datetimes as UTC, non-string dict keys
+_CACHE_JSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+)
+
 class DataType(Enum):
     MARKET_DATA = "market_data"
     TRADING_SIGNALS = "trading_signals"
@@ -55,7 +66,7 @@ class DataManagementSystem:
                 retention_period=timedelta(days=7),
                 storage_type=StorageType.MONGODB,
                 compression_level=6,
-                batch_size=100,
+                batch_size=1000,
                 index_fields=['symbol', 'timestamp', 'signal_type']
             ),
             DataType.SYSTEM_METRICS: DataConfig(
@@ -69,17 +80,58 @@ class DataManagementSystem:
                 retention_period=timedelta(days=90),
                 storage_type=StorageType.MONGODB,
                 compression_level=8,
-                batch_size=50,
+                batch_size=1000,
                 index_fields=['order_id', 'timestamp', 'status']
             )
         }
         
+        # Fields every stored row must carry (indexes, retention and partitioning use them)
+        self.required_fields = {
+            data_type: frozenset(config.index_fields)
+            for data_type, config in self.storage_configs.items()
+        }
+        
+        # ClickHouse table columns
+        self.clickhouse_columns = {
+            DataType.MARKET_DATA: {
+                'symbol': 'LowCardinality(String)',
+                'timestamp': 'DateTime64(3)',
+                'price': 'Float64',
+                'size': 'Float64',
+                'volume': 'Float64'
+            },
+            DataType.SYSTEM_METRICS: {
+                'component': 'LowCardinality(String)',
+                'timestamp': 'DateTime64(3)',
+                'metric_type': 'LowCardinality(String)',
+                'metric_value': 'Float64'
+            }
+        }
+        
+        # Numeric ClickHouse columns, packed into typed arrays on insert
+        self.clickhouse_dtypes = {
+            data_type: {
+                name: np.float64 for name, column_type in columns.items()
+                if column_type == 'Float64'
+            }
+            for data_type, columns in self.clickhouse_columns.items()
+        }
+        
+        # INSERT statements keyed by (data_type, column tuple)
+        self._clickhouse_inserts = {}
+        
         # Database connections
         self.connections = {}
         
-        # Data buffers
+        # clickhouse_driver is blocking and not thread-safe: run it on one dedicated thread
+        self._clickhouse_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clickhouse')
+        
+        # Data buffers (double-buffered: flushes swap in the spare deque)
         self.write_buffers = {
-            data_type: [] for data_type in DataType
+            data_type: deque() for data_type in DataType
+        }
+        self._spare_buffers = {
+            data_type: deque() for data_type in DataType
         }
         
         # Cache configuration
@@ -88,20 +140,34 @@ class DataManagementSystem:
             'ttl': 3600  # 1 hour
         }
         
+        # In-process LRU in front of Redis: cache_key -> (expires_at, data)
+        self._l1 = OrderedDict()
+        
     async def initialize(self) -> bool:
         """Initialize the Data Management System."""
         try:
             # Initialize database connections
-            self.connections[StorageType.REDIS] = await aioredis.create_redis_pool(
-                'redis://localhost'
+            # redis-py picks the hiredis parser automatically when it is installed
+            self.connections[StorageType.REDIS] = Redis(
+                connection_pool=ConnectionPool.from_url(
+                    'redis://localhost', max_connections=64, decode_responses=False
+                )
             )
             
             self.connections[StorageType.MONGODB] = motor.motor_asyncio.AsyncIOMotorClient(
                 'mongodb://localhost:27017'
             )
             
+            # Let the server coalesce small inserts into larger parts
             self.connections[StorageType.CLICKHOUSE] = clickhouse_driver.Client(
-                host='localhost'
+                host='localhost',
+                compression='lz4',
+                settings={
+                    'async_insert': 1,
+                    'wait_for_async_insert': 0,
+                    'async_insert_max_data_size': 1_000_000,
+                    'async_insert_busy_timeout_ms': 1000
+                }
             )
             
             # Initialize databases and collections
@@ -120,6 +186,34 @@ class DataManagementSystem:
             self.logger.error(f"Initialization failed: {str(e)}")
             return False
 
+    async def _initialize_storage(self):
+        """Create tables and collection indexes once at startup."""
+        # Daily partitions keep cleanup to partition drops; sorting by index_fields lets
+        # filtered queries skip granules
+        for data_type, config in self.storage_configs.items():
+            if config.storage_type == StorageType.CLICKHOUSE:
+                columns = ', '.join(
+                    f'{name} {column_type}'
+                    for name, column_type in self.clickhouse_columns[data_type].items()
+                )
+                await self._clickhouse_execute(
+                    f'CREATE TABLE IF NOT EXISTS {data_type.value} ({columns}) '
+                    f'ENGINE = MergeTree '
+                    f'PARTITION BY toYYYYMMDD(timestamp) '
+                    f'ORDER BY ({", ".join(config.index_fields)}) '
+                    f'SETTINGS index_granularity = 8192'
+                )
+        
+        # Compound index over index_fields; create_index is a no-op when it already exists
+        db = self.connections[StorageType.MONGODB].trading_system
+        await asyncio.gather(*(
+            db[data_type.value].create_index(
+                [(field, ASCENDING) for field in config.index_fields]
+            )
+            for data_type, config in self.storage_configs.items()
+            if config.storage_type == StorageType.MONGODB
+        ))
+
     async def store_data(self, data_type: DataType, data: Union[Dict, List[Dict]]) -> bool:
         """Store data of specified type."""
         try:
@@ -128,6 +222,18 @@ class DataManagementSystem:
             # Convert single item to list
             if isinstance(data, dict):
                 data = [data]
+            if not data:
+                return True
+            
+            # Reject malformed rows here instead of failing a whole batch at flush time
+            required = self.required_fields[data_type]
+            if not all(required <= row.keys() for row in data):
+                raise ValueError(f"{data_type.value} rows must include {sorted(required)}")
+            
+            # ClickHouse batches server-side via async_insert, so send immediately
+            if config.storage_type == StorageType.CLICKHOUSE:
+                await self._store_clickhouse(data_type, data)
+                return True
             
             # Add to write buffer
             self.write_buffers[data_type].extend(data)
@@ -177,12 +283,19 @@ class DataManagementSystem:
 
     async def _flush_buffer(self, data_type: DataType):
         """Flush write buffer for specified data type."""
+        data = None
         try:
-            if not self.write_buffers[data_type]:
+            buffer = self.write_buffers[data_type]
+            if not buffer:
                 return
             
+            # Swap buffers so writes arriving during the flush land in the other deque
+            self.write_buffers[data_type] = self._spare_buffers[data_type]
+            self._spare_buffers[data_type] = buffer
+            data = list(buffer)
+            buffer.clear()
+            
             config = self.storage_configs[data_type]
-            data = self.write_buffers[data_type]
             
             if config.storage_type == StorageType.MONGODB:
                 await self._store_mongodb(data_type, data)
@@ -191,11 +304,20 @@ class DataManagementSystem:
             elif config.storage_type == StorageType.FILE:
                 await self._store_file(data_type, data)
             
-            # Clear buffer
-            self.write_buffers[data_type] = []
+        except BulkWriteError as e:
+            # Unordered insert: only the documents listed failed, and duplicate keys
+            # (code 11000) are already stored, so requeue just the remaining failures
+            retry = [data[error['index']] for error in e.details.get('writeErrors', ())
+                     if error.get('code') != 11000]
+            self.logger.error(f"Buffer flush failed for {len(retry)} documents: {str(e)}")
+            if retry:
+                self.write_buffers[data_type].extendleft(reversed(retry))
             
         except Exception as e:
             self.logger.error(f"Buffer flush failed: {str(e)}")
+            # Put the batch back ahead of newer writes for the next flush
+            if data:
+                self.write_buffers[data_type].extendleft(reversed(data))
 
     async def _store_mongodb(self, data_type: DataType, data: List[Dict]):
         """Store data in MongoDB."""
@@ -203,8 +325,8 @@ class DataManagementSystem:
             db = self.connections[StorageType.MONGODB].trading_system
             collection = db[data_type.value]
             
-            # Insert data
-            await collection.insert_many(data)
+            # Unordered insert lets the server apply documents in parallel
+            await collection.insert_many(data, ordered=False, bypass_document_validation=True)
             
         except Exception as e:
             self.logger.error(f"MongoDB storage failed: {str(e)}")
@@ -213,25 +335,75 @@ class DataManagementSystem:
     async def _store_clickhouse(self, data_type: DataType, data: List[Dict]):
         """Store data in ClickHouse."""
         try:
-            # Convert data to DataFrame for batch insert
-            df = pd.DataFrame(data)
-            
-            # Execute insert
-            self.connections[StorageType.CLICKHOUSE].execute(
-                f'INSERT INTO {data_type.value} VALUES',
-                df.to_dict('records')
+            # Transpose rows into per-column sequences for the native columnar protocol;
+            # numeric columns go straight into contiguous typed arrays
+            dtypes = self.clickhouse_dtypes.get(data_type, {})
+            columns = tuple(data[0])
+            count = len(data)
+            column_data = [
+                np.fromiter((row[column] for row in data), dtype=dtypes[column], count=count)
+                if column in dtypes else [row[column] for row in data]
+                for column in columns
+            ]
+            
+            query = self._clickhouse_inserts.get((data_type, columns))
+            if query is None:
+                query = f'INSERT INTO {data_type.value} ({", ".join(columns)}) VALUES'
+                self._clickhouse_inserts[(data_type, columns)] = query
+            
+            # The driver ships column_data as Native blocks; the VALUES clause is never parsed
+            await self._clickhouse_execute(
+                query,
+                column_data,
+                columnar=True,
+                types_check=False
             )
             
         except Exception as e:
             self.logger.error(f"ClickHouse storage failed: {str(e)}")
             raise
 
+    def _generate_cache_key(self, data_type: DataType, query: Dict,
+                            start_time: Optional[datetime], end_time: Optional[datetime]) -> str:
+        """Build a compact cache key from the query parameters."""
+        # Sorted keys so equal queries share an entry regardless of dict order
+        payload = orjson.dumps(
+            (data_type.value, query, start_time, end_time),
+            default=str,
+            option=orjson.OPT_SORT_KEYS
+        )
+        return f"q:{data_type.value}:{blake2b(payload, digest_size=8).hexdigest()}"
+
+    async def _clickhouse_execute(self, *args, **kwargs):
+        """Run a ClickHouse call on the driver thread so compression and I/O stay off the loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._clickhouse_executor,
+            partial(self.connections[StorageType.CLICKHOUSE].execute, *args, **kwargs)
+        )
+
+    def _l1_put(self, cache_key: str, payload: bytes):
+        """Insert an encoded payload into the in-process cache, evicting least recently used entries."""
+        self._l1[cache_key] = (monotonic() + self.cache_config['ttl'], payload)
+        self._l1.move_to_end(cache_key)
+        while len(self._l1) > self.cache_config['max_size']:
+            self._l1.popitem(last=False)
+
     async def _get_from_cache(self, cache_key: str) -> Optional[List[Dict]]:
-        """Retrieve data from Redis cache."""
+        """Retrieve data from the in-process cache, falling back to Redis."""
         try:
+            # Both tiers hold the same encoded payload, so every hit decodes a fresh copy
+            entry = self._l1.get(cache_key)
+            if entry is not None:
+                if entry[0] > monotonic():
+                    self._l1.move_to_end(cache_key)
+                    return orjson.loads(entry[1])
+                del self._l1[cache_key]
+            
             cached = await self.connections[StorageType.REDIS].get(cache_key)
             if cached:
-                return json.loads(cached)
+                self._l1_put(cache_key, cached)
+                return orjson.loads(cached)
             return None
             
         except Exception as e:
@@ -239,12 +411,12 @@ class DataManagementSystem:
             return None
 
     async def _store_in_cache(self, cache_key: str, data: List[Dict]):
-        """Store data in Redis cache."""
+        """Store data in the in-process and Redis caches."""
         try:
+            payload = orjson.dumps(data, default=str, option=_CACHE_JSON_OPTIONS)
+            self._l1_put(cache_key, payload)
             await self.connections[StorageType.REDIS].setex(
-                cache_key,
-                self.cache_config['ttl'],
-                json.dumps(data)
+                cache_key, self.cache_config['ttl'], payload
             )
             
         except Exception as e:
@@ -254,26 +426,39 @@ class DataManagementSystem:
         """Clean up expired data periodically."""
         while True:
             try:
+                now = datetime.now()
+                mongo_deletes = []
                 for data_type, config in self.storage_configs.items():
-                    cutoff_time = datetime.now() - config.retention_period
+                    cutoff_time = now - config.retention_period
                     
                     if config.storage_type == StorageType.MONGODB:
                         db = self.connections[StorageType.MONGODB].trading_system
-                        await db[data_type.value].delete_many({
+                        mongo_deletes.append(db[data_type.value].delete_many({
                             'timestamp': {'$lt': cutoff_time}
-                        })
+                        }))
                     elif config.storage_type == StorageType.CLICKHOUSE:
-                        self.connections[StorageType.CLICKHOUSE].execute(
-                            f'ALTER TABLE {data_type.value} DELETE WHERE timestamp < %s',
-                            (cutoff_time,)
-                        )
+                        await self._drop_expired_partitions(data_type.value, cutoff_time)
                 
+                await asyncio.gather(*mongo_deletes)
                 await asyncio.sleep(3600)  # Run every hour
                 
             except Exception as e:
                 self.logger.error(f"Data cleanup failed: {str(e)}")
                 await asyncio.sleep(300)  # Back off on error
 
+    async def _drop_expired_partitions(self, table: str, cutoff_time: datetime):
+        """Drop ClickHouse daily partitions that end before the cutoff day."""
+        # Tables are PARTITION BY toYYYYMMDD(timestamp); dropping a partition is a metadata
+        # operation, unlike ALTER ... DELETE which rewrites every affected part
+        expired = await self._clickhouse_execute(
+            'SELECT DISTINCT partition_id FROM system.parts '
+            'WHERE database = currentDatabase() AND table = %(table)s AND active '
+            'AND toUInt32(partition_id) < %(cutoff_day)s',
+            {'table': table, 'cutoff_day': int(cutoff_time.strftime('%Y%m%d'))}
+        )
+        for (partition_id,) in expired:
+            await self._clickhouse_execute(f"ALTER TABLE {table} DROP PARTITION ID '{partition_id}'")
+
     async def optimize_storage(self, data_type: DataType):
         """Optimize storage for specific data type."""
         try:
@@ -286,7 +471,7 @@ class DataManagementSystem:
                 
             elif config.storage_type == StorageType.CLICKHOUSE:
                 # Optimize table
-                self.connections[StorageType.CLICKHOUSE].execute(
+                await self._clickhouse_execute(
                     f'OPTIMIZE TABLE {data_type.value} FINAL'
                 )
             
@@ -297,27 +482,27 @@ class DataManagementSystem:
         """Get storage statistics."""
         try:
             stats = {}
+            mongo_types = []
             
-            for data_type in DataType:
-                config = self.storage_configs[data_type]
-                
+            for data_type, config in self.storage_configs.items():
                 if config.storage_type == StorageType.MONGODB:
-                    db = self.connections[StorageType.MONGODB].trading_system
-                    stats[data_type.value] = {
-                        'count': await db[data_type.value].count_documents({}),
-                        'size': await db.command('collstats', data_type.value)['size'],
-                        'indexes': len(config.index_fields)
-                    }
+                    mongo_types.append((data_type, config))
                 elif config.storage_type == StorageType.CLICKHOUSE:
-                    stats[data_type.value] = {
-                        'rows': self.connections[StorageType.CLICKHOUSE].execute(
-                            f'SELECT count() FROM {data_type.value}'
-                        )[0][0],
-                        'size': self.connections[StorageType.CLICKHOUSE].execute(
-                            f'SELECT total_bytes FROM system.tables WHERE name = %s',
-                            (data_type.value,)
-                        )[0][0]
-                    }
+                    # Row count and size come from table metadata rather than a count() scan
+                    result = await self._clickhouse_execute(
+                        'SELECT total_rows, total_bytes FROM system.tables '
+                        'WHERE database = currentDatabase() AND name = %(name)s',
+                        {'name': data_type.value}
+                    )
+                    rows, size = result[0]
+                    stats[data_type.value] = {'rows': rows, 'size': size}
+            
+            # Collections are independent, so fetch their stats concurrently
+            mongo_stats = await asyncio.gather(*(
+                self._get_mongodb_stats(data_type, config) for data_type, config in mongo_types
+            ))
+            for (data_type, _), collection_stats in zip(mongo_types, mongo_stats):
+                stats[data_type.value] = collection_stats
             
             return stats
             
@@ -325,12 +510,21 @@ class DataManagementSystem:
             self.logger.error(f"Stats retrieval failed: {str(e)}")
             return {}
 
+    async def _get_mongodb_stats(self, data_type: DataType, config: DataConfig) -> Dict:
+        """Collection count and size from a single collStats metadata read."""
+        db = self.connections[StorageType.MONGODB].trading_system
+        coll_stats = await db.command('collStats', data_type.value)
+        return {
+            'count': coll_stats['count'],
+            'size': coll_stats['size'],
+            'indexes': len(config.index_fields)
+        }
+
     async def shutdown(self):
         """Clean shutdown of the Data Management System."""
         try:
-            # Flush all buffers
-            for data_type in DataType:
-                await self._flush_buffer(data_type)
+            # Flush all buffers; each targets its own collection or table
+            await asyncio.gather(*(self._flush_buffer(data_type) for data_type in DataType))
             
             # Cancel background tasks
             for task in self.tasks.values():
@@ -339,6 +533,7 @@ class DataManagementSystem:
             # Close connections
             for connection in self.connections.values():
                 await connection.close()
+            self._clickhouse_executor.shutdown(wait=False)
             
             self.logger.info("Data Management System shut down successfully")
             
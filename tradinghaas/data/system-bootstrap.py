@@ -4,7 +4,14 @@ import asyncio
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
-import json
+import time
+from collections import deque
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Windows or not installed: stock asyncio loop
+    uvloop = None
 
 class Priority(Enum):
     P0 = "P0"  # Critical: 10ms max latency
@@ -26,38 +33,42 @@ class ResourceAllocation:
     bandwidth: float
 
 class SystemMessage:
+    __slots__ = ('id', 'type', 'source', 'destination', 'priority', 'timestamp_ns',
+                 'payload', 'metadata', '_prio_str')
+
     def __init__(self, msg_type: str, source: str, destination: str, priority: Priority):
-        self.id = f"MSG{int(datetime.now().timestamp()*1000)}"
+        now_ns = time.time_ns()
+        self.id = f"MSG{now_ns // 1_000_000}"
         self.type = msg_type
         self.source = source
         self.destination = destination
         self.priority = priority
-        self.timestamp = datetime.now().isoformat()
+        self._prio_str = priority.value
+        self.timestamp_ns = now_ns  # ISO form is only built in to_json
         self.payload = {}
         self.metadata = {}
 
     def to_json(self) -> str:
-        return json.dumps({
+        return orjson.dumps({
             "type": self.type,
             "id": self.id,
             "source": self.source,
             "destination": self.destination,
-            "priority": self.priority.value,
-            "timestamp": self.timestamp,
+            "priority": self._prio_str,
+            "timestamp": datetime.fromtimestamp(self.timestamp_ns / 1e9),
             "payload": self.payload,
             "metadata": self.metadata
-        })
+        }).decode()
 
 class AgentManager:
     def __init__(self):
         self.agents = {}
         self.resource_allocations = {}
-        self.message_queues = {
-            Priority.P0: asyncio.Queue(),
-            Priority.P1: asyncio.Queue(),
-            Priority.P2: asyncio.Queue(),
-            Priority.P3: asyncio.Queue()
-        }
+        # One deque per priority (P0 first); bit i of _ready_mask is set while queue i is non-empty
+        self._priority_index = {priority: i for i, priority in enumerate(Priority)}
+        self._queues = [deque() for _ in Priority]
+        self._ready_mask = 0
+        self._message_ready = asyncio.Event()  # Set by enqueue so dispatchers can wait instead of polling
         self.logger = logging.getLogger("AgentManager")
 
     async def register_agent(self, name: str, resource_allocation: ResourceAllocation) -> bool:
@@ -78,6 +89,31 @@ class AgentManager:
             self.logger.error(f"Failed to register agent {name}: {str(e)}")
             return False
 
+    def enqueue(self, message: SystemMessage):
+        """Queue a message at its priority."""
+        index = self._priority_index[message.priority]
+        self._queues[index].append(message)
+        self._ready_mask |= 1 << index
+        self._message_ready.set()
+
+    def pop_highest(self) -> Optional[SystemMessage]:
+        """Pop the oldest message of the highest non-empty priority, or None if all are empty."""
+        if not self._ready_mask:
+            return None
+        index = (self._ready_mask & -self._ready_mask).bit_length() - 1
+        queue = self._queues[index]
+        message = queue.popleft()
+        if not queue:
+            self._ready_mask &= ~(1 << index)
+        return message
+
+    async def get_highest(self) -> SystemMessage:
+        """Wait for a message, then pop the oldest one of the highest non-empty priority."""
+        while not self._ready_mask:
+            self._message_ready.clear()
+            await self._message_ready.wait()
+        return self.pop_highest()
+
     async def _allocate_resources(self, agent_name: str, allocation: ResourceAllocation):
         # Implement resource allocation logic
         pass
@@ -177,4 +213,6 @@ async def main():
         logging.critical("HASS Trading System initialization failed")
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
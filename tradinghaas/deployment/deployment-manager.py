@@ -1,16 +1,28 @@
 import asyncio
 import logging
-from dataclasses import dataclass
-from datetime import datetime
+from collections import defaultdict
+from dataclasses import dataclass, replace
 from enum import Enum
-from typing import Dict, List, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 import docker
-import kubernetes
-from kubernetes import client, config
+from kubernetes_asyncio import client, config, watch
 import yaml
 import os
 from pathlib import Path
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader
+
+@lru_cache(maxsize=1)
+def apps_v1_api() -> client.AppsV1Api:
+    """Process-wide AppsV1 API; all callers share one ApiClient and its connection pool."""
+    # Call only after the kube config is loaded, from the event loop that will use it
+    return client.AppsV1Api(client.ApiClient())
+
 class DeploymentState(Enum):
     PENDING = "PENDING"
     DEPLOYING = "DEPLOYING"
@@ -26,7 +38,7 @@ class ResourceType(Enum):
     QUEUE = "QUEUE"
     CACHE = "CACHE"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ResourceConfig:
     name: str
     type: ResourceType
@@ -34,8 +46,13 @@ class ResourceConfig:
     cpu_limit: str
     memory_limit: str
     storage_limit: Optional[str]
-    environment: Dict[str, str]
-    dependencies: List[str]
+    environment: Mapping[str, str]
+    dependencies: Tuple[str, ...]
+    
+    def __post_init__(self):
+        # Freeze the containers too, so equality with a cached config implies an identical manifest
+        object.__setattr__(self, 'environment', MappingProxyType(dict(self.environment)))
+        object.__setattr__(self, 'dependencies', tuple(self.dependencies))
 
 class DeploymentManager:
     """
@@ -56,6 +73,21 @@ class DeploymentManager:
         self.deployment_states = {}
         self.health_checks = {}
         
+        # Rendered deployment manifests: name -> (config, manifest)
+        self._deployment_templates = {}
+        
+        # Env var entries shared across manifests: (name, value) -> entry
+        self._env_entries = {}
+        
+        # Dependency graph, rebuilt whenever resource configurations change
+        self._reverse_deps = {}
+        self._in_degree = {}
+        self._deployment_layers = None
+        
+        # Deployment status cache fed by a namespace watch:
+        # name -> {replicas, available, ready, last_transition}
+        self._state = {}
+        
         # Scaling parameters
         self.scaling_thresholds = {
             'cpu_threshold': 0.8,
@@ -67,12 +99,17 @@ class DeploymentManager:
         """Initialize the Deployment Manager."""
         try:
             # Load Kubernetes configuration
-            config.load_kube_config()
-            self.k8s_client = client.ApiClient()
-            self.k8s_api = client.AppsV1Api(self.k8s_client)
+            await config.load_kube_config()
+            self.k8s_api = apps_v1_api()
+            self.k8s_client = self.k8s_api.api_client
             
             # Load deployment configurations
             await self._load_configurations()
+            self._build_dependency_graph()
+            
+            # Keep deployment state cached from a watch, relisting periodically
+            self.watch_task = asyncio.create_task(self._watch_deployments())
+            self.reconcile_task = asyncio.create_task(self._reconcile_deployments())
             
             # Initialize resource monitoring
             self.monitor_task = asyncio.create_task(
@@ -96,11 +133,14 @@ class DeploymentManager:
             if not await self._deploy_infrastructure():
                 raise Exception("Infrastructure deployment failed")
             
-            # Deploy agents in dependency order
-            deployment_order = self._calculate_deployment_order()
-            for resource_name in deployment_order:
-                if not await self.deploy_resource(resource_name):
-                    raise Exception(f"Resource deployment failed: {resource_name}")
+            # Deploy agents layer by layer; resources within a layer are independent
+            for layer in self._calculate_deployment_layers():
+                results = await asyncio.gather(
+                    *(self.deploy_resource(resource_name) for resource_name in layer)
+                )
+                failed = [name for name, deployed in zip(layer, results) if not deployed]
+                if failed:
+                    raise Exception(f"Resource deployment failed: {', '.join(failed)}")
             
             self.logger.info("System deployment completed successfully")
             return True
@@ -147,8 +187,7 @@ class DeploymentManager:
             self.deployment_states[resource_name] = DeploymentState.UPDATING
             
             # Update configuration
-            updated_config = {**resource_config.__dict__, **updates}
-            new_config = ResourceConfig(**updated_config)
+            new_config = replace(resource_config, **updates)
             
             # Apply updates
             deployment = self._create_deployment_config(new_config)
@@ -157,6 +196,7 @@ class DeploymentManager:
             # Wait for update to complete
             if await self._wait_for_deployment(resource_name):
                 self.resources[resource_name] = new_config
+                self._build_dependency_graph()
                 self.deployment_states[resource_name] = DeploymentState.RUNNING
                 return True
             
@@ -172,23 +212,18 @@ class DeploymentManager:
             if resource_name not in self.resources:
                 raise ValueError(f"Resource not found: {resource_name}")
             
-            # Update deployment
-            deployment = self.k8s_api.read_namespaced_deployment(
-                name=resource_name,
-                namespace="trading-system"
-            )
-            
-            deployment.spec.replicas = replicas
-            
-            self.k8s_api.patch_namespaced_deployment(
+            # Patch the scale subresource: one small request, no read-modify-write
+            await self.k8s_api.patch_namespaced_deployment_scale(
                 name=resource_name,
                 namespace="trading-system",
-                body=deployment
+                body={'spec': {'replicas': replicas}}
             )
             
             # Wait for scaling to complete
             if await self._wait_for_deployment(resource_name):
-                self.resources[resource_name].replicas = replicas
+                self.resources[resource_name] = replace(
+                    self.resources[resource_name], replicas=replicas
+                )
                 return True
             
             return False
@@ -201,28 +236,31 @@ class DeploymentManager:
         """Monitor resource utilization and health."""
         while True:
             try:
-                for resource_name, resource in self.resources.items():
-                    # Skip if not running
-                    if self.deployment_states[resource_name] != DeploymentState.RUNNING:
-                        continue
-                    
-                    # Get metrics
-                    metrics = await self._get_resource_metrics(resource_name)
-                    
+                running = [
+                    resource_name for resource_name in self.resources
+                    if self.deployment_states.get(resource_name) == DeploymentState.RUNNING
+                ]
+                
+                # Metrics requests are independent, so issue them together
+                all_metrics = await asyncio.gather(
+                    *(self._get_resource_metrics(resource_name) for resource_name in running)
+                )
+                
+                scaling = []
+                for resource_name, metrics in zip(running, all_metrics):
                     # Check thresholds
                     if await self._check_scaling_needed(resource_name, metrics):
                         # Calculate new replica count
                         new_replicas = await self._calculate_replicas(
                             resource_name, metrics
                         )
-                        
-                        # Scale resource
-                        await self.scale_resource(resource_name, new_replicas)
+                        scaling.append(self.scale_resource(resource_name, new_replicas))
                     
-                    # Update health status
-                    self.health_checks[resource_name] = await self._check_health(
-                        resource_name
-                    )
+                    # Update health status from the cached deployment state
+                    self.health_checks[resource_name] = self._is_available(resource_name)
+                
+                # Scale resources concurrently; each waits on its own rollout
+                await asyncio.gather(*scaling)
                 
                 await asyncio.sleep(30)  # Check every 30 seconds
                 
@@ -230,9 +268,69 @@ class DeploymentManager:
                 self.logger.error(f"Resource monitoring failed: {str(e)}")
                 await asyncio.sleep(60)  # Back off on error
 
+    async def _watch_deployments(self):
+        """Apply deployment events from the namespace to the state cache."""
+        while True:
+            try:
+                async with watch.Watch() as w:
+                    async for event in w.stream(
+                        self.k8s_api.list_namespaced_deployment,
+                        namespace="trading-system"
+                    ):
+                        deployment = event['object']
+                        if event['type'] == 'DELETED':
+                            self._state.pop(deployment.metadata.name, None)
+                        else:
+                            self._state[deployment.metadata.name] = self._deployment_state(deployment)
+                
+            except Exception as e:
+                self.logger.error(f"Deployment watch failed: {str(e)}")
+                await asyncio.sleep(5)  # Back off before re-watching
+
+    async def _reconcile_deployments(self):
+        """Relist deployments periodically to heal any events the watch missed."""
+        while True:
+            try:
+                deployments = await self.k8s_api.list_namespaced_deployment(
+                    namespace="trading-system"
+                )
+                self._state = {
+                    deployment.metadata.name: self._deployment_state(deployment)
+                    for deployment in deployments.items
+                }
+                
+            except Exception as e:
+                self.logger.error(f"Deployment reconciliation failed: {str(e)}")
+            
+            await asyncio.sleep(60)
+
+    @staticmethod
+    def _deployment_state(deployment) -> Dict:
+        """Extract the cached fields from a deployment object."""
+        status = deployment.status
+        return {
+            'replicas': deployment.spec.replicas or 0,
+            'available': status.available_replicas or 0,
+            'ready': status.ready_replicas or 0,
+            'last_transition': max(
+                (condition.last_transition_time for condition in status.conditions or ()),
+                default=None
+            )
+        }
+
+    def _is_available(self, resource_name: str) -> bool:
+        """Whether the cached state shows every desired replica available."""
+        state = self._state.get(resource_name)
+        return state is not None and state['available'] == state['replicas']
+
     def _create_deployment_config(self, resource_config: ResourceConfig) -> Dict:
         """Create Kubernetes deployment configuration."""
-        return {
+        # Reuse the rendered manifest while the resource's configuration is unchanged
+        cached = self._deployment_templates.get(resource_config.name)
+        if cached is not None and cached[0] == resource_config:
+            return cached[1]
+        
+        deployment = {
             'apiVersion': 'apps/v1',
             'kind': 'Deployment',
             'metadata': {
@@ -263,7 +361,7 @@ class DeploymentManager:
                                 }
                             },
                             'env': [
-                                {'name': k, 'value': v}
+                                self._env_entry(k, v)
                                 for k, v in resource_config.environment.items()
                             ]
                         }]
@@ -271,47 +369,94 @@ class DeploymentManager:
                 }
             }
         }
+        
+        self._deployment_templates[resource_config.name] = (resource_config, deployment)
+        return deployment
 
-    async def _calculate_deployment_order(self) -> List[str]:
-        """Calculate deployment order based on dependencies."""
-        deployed = set()
-        deployment_order = []
+    async def _load_configurations(self):
+        """Load resource configurations from the deployment file."""
+        raw = await asyncio.to_thread(self._read_configuration_file)
+        self.resources = {}
+        for entry in raw.get('resources', []):
+            resource = ResourceConfig(
+                name=entry['name'],
+                type=ResourceType(entry['type']),
+                replicas=entry.get('replicas', 1),
+                cpu_limit=entry['cpu_limit'],
+                memory_limit=entry['memory_limit'],
+                storage_limit=entry.get('storage_limit'),
+                environment=entry.get('environment', {}),
+                dependencies=entry.get('dependencies', [])
+            )
+            self.resources[resource.name] = resource
+            self.deployment_states.setdefault(resource.name, DeploymentState.PENDING)
+
+    def _read_configuration_file(self) -> Dict:
+        """Parse the deployment YAML with the libyaml loader when available."""
+        with open(self.config_path, 'rb') as f:
+            return yaml.load(f, Loader=SafeLoader) or {}
+
+    def _env_entry(self, name: str, value: str) -> Dict[str, str]:
+        """Return the shared manifest entry for an env var; entries are never mutated."""
+        entry = self._env_entries.get((name, value))
+        if entry is None:
+            entry = self._env_entries[(name, value)] = {'name': name, 'value': value}
+        return entry
+
+    def _build_dependency_graph(self):
+        """Precompute dependents and in-degrees for the deployment order."""
+        self._reverse_deps = defaultdict(list)
+        self._in_degree = {}
+        for resource_name, resource in self.resources.items():
+            self._in_degree[resource_name] = len(resource.dependencies)
+            for dependency in resource.dependencies:
+                self._reverse_deps[dependency].append(resource_name)
+        self._deployment_layers = None
+
+    def _calculate_deployment_layers(self) -> List[List[str]]:
+        """Group resources into layers that depend only on earlier layers (Kahn's algorithm)."""
+        if self._deployment_layers is not None:
+            return self._deployment_layers
         
-        def can_deploy(resource_name):
-            return all(dep in deployed for dep in 
-                      self.resources[resource_name].dependencies)
+        in_degree = dict(self._in_degree)
+        layer = [name for name, degree in in_degree.items() if degree == 0]
+        layers = []
+        placed = 0
         
-        while len(deployed) < len(self.resources):
-            deployable = [
-                name for name in self.resources
-                if name not in deployed and can_deploy(name)
-            ]
-            
-            if not deployable:
-                raise Exception("Circular dependency detected")
-            
-            for resource_name in deployable:
-                deployment_order.append(resource_name)
-                deployed.add(resource_name)
+        while layer:
+            layers.append(layer)
+            placed += len(layer)
+            next_layer = []
+            for resource_name in layer:
+                for dependent in self._reverse_deps.get(resource_name, ()):
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        next_layer.append(dependent)
+            layer = next_layer
+        
+        # Anything left unplaced sits on a cycle or depends on an unknown resource
+        if placed != len(self.resources):
+            raise Exception("Circular dependency detected")
         
-        return deployment_order
+        self._deployment_layers = layers
+        return layers
 
     async def _wait_for_deployment(self, resource_name: str, 
                                  timeout: int = 300) -> bool:
         """Wait for deployment to be ready."""
         try:
-            start_time = datetime.now()
-            while (datetime.now() - start_time).seconds < timeout:
-                deployment = self.k8s_api.read_namespaced_deployment_status(
-                    name=resource_name,
-                    namespace="trading-system"
-                )
-                
-                if (deployment.status.available_replicas == 
-                    deployment.spec.replicas):
-                    return True
-                
-                await asyncio.sleep(5)
+            # The first event carries the current state, so an already-ready deployment returns at once
+            async with watch.Watch() as w:
+                async for event in w.stream(
+                    self.k8s_api.list_namespaced_deployment,
+                    namespace="trading-system",
+                    field_selector=f"metadata.name={resource_name}",
+                    timeout_seconds=timeout
+                ):
+                    deployment = event['object']
+                    if (event['type'] != 'DELETED' and
+                        deployment.status.available_replicas == deployment.spec.replicas):
+                        return True
             
             return False
             
@@ -322,14 +467,21 @@ class DeploymentManager:
     async def shutdown(self):
         """Clean shutdown of the Deployment Manager."""
         try:
-            # Cancel monitoring task
+            # Cancel monitoring and state cache tasks
             if self.monitor_task:
                 self.monitor_task.cancel()
+            self.watch_task.cancel()
+            self.reconcile_task.cancel()
             
             # Stop all resources
             for resource_name in self.resources:
                 await self._stop_resource(resource_name)
             
+            # Release the shared API client's HTTP session
+            if self.k8s_client:
+                await self.k8s_client.close()
+                apps_v1_api.cache_clear()
+            
             self.logger.info("Deployment Manager shut down successfully")
             
         except Exception as e:
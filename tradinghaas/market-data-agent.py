@@ -1,57 +1,91 @@
-import os
-import redis
+import asyncio
 import time
-import requests
-import json
-from dotenv import load_dotenv
+from datetime import datetime, timezone
+import aiohttp
+import redis.asyncio as redis
+import orjson
+from config import POLYGON_API_KEY, REDIS_CHANNEL, REDIS_HOST, REDIS_PORT
 
-# Load environment variables
-load_dotenv(dotenv_path="./.env")
+try:
+    import uvloop
+except ImportError:  # Windows or not installed: stock asyncio loop
+    uvloop = None
 
-# Polygon API Key from .env
-POLYGON_API_KEY = os.getenv("POLYGON_API_KEY")
 if not POLYGON_API_KEY:
     raise Exception("POLYGON_API_KEY not found in .env file!")
 
-# Redis Configuration
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_CHANNEL = os.getenv("REDIS_CHANNEL", "market-data")
-
 # Polygon API URL
 BASE_URL = "https://api.polygon.io/v2/aggs/ticker"
 
+TICKERS = ["AAPL", "MSFT", "GOOGL"]  # Example tickers
+
+# Request URLs and query params rendered once for the fixed ticker list
+URLS = {ticker: f"{BASE_URL}/{ticker}/prev" for ticker in TICKERS}
+AUTH_PARAMS = {"apiKey": POLYGON_API_KEY}
+
+# Approximate cap on market data stream length
+STREAM_MAXLEN = 100_000
+
+# Previous-close data only changes once per trading day, so responses are reused
+# for CACHE_TTL seconds within the same UTC date: ticker -> (fetched_at, date, data)
+CACHE_TTL = 300
+response_cache = {}
+
 # Connect to Redis
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=False)
 
-def fetch_market_data(ticker, interval="1min", limit=1):
+async def fetch_market_data(session, ticker, interval="1min", limit=1):
     """
     Fetch market data for a specific ticker from the Polygon API.
     """
-    url = f"{BASE_URL}/{ticker}/prev?apiKey={POLYGON_API_KEY}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error fetching data for {ticker}: {response.status_code} - {response.text}")
-        return None
-
-def publish_to_redis(channel, data):
+    now = time.monotonic()
+    today = datetime.now(timezone.utc).date()
+    cached = response_cache.get(ticker)
+    if cached and cached[1] == today and now - cached[0] < CACHE_TTL:
+        return cached[2]
+
+    url = URLS.get(ticker) or f"{BASE_URL}/{ticker}/prev"
+    async with session.get(url, params=AUTH_PARAMS) as response:
+        if response.status == 200:
+            data = await response.json(loads=orjson.loads)
+            response_cache[ticker] = (now, today, data)
+            return data
+        else:
+            print(f"Error fetching data for {ticker}: {response.status} - {await response.text()}")
+            return None
+
+async def publish_to_redis(stream, items):
     """
-    Publish data to a Redis channel.
+    Append a batch of (ticker, data) entries to a Redis stream in a single round trip.
     """
-    redis_client.publish(channel, json.dumps(data))
-
-def main():
-    tickers = ["AAPL", "MSFT", "GOOGL"]  # Example tickers
-    while True:
-        for ticker in tickers:
-            data = fetch_market_data(ticker)
-            if data:
-                publish_to_redis(REDIS_CHANNEL, data)
-                print(f"Published data for {ticker} to Redis channel {REDIS_CHANNEL}")
-        # Adjust sleep interval as needed
-        time.sleep(60)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for ticker, data in items:
+            pipe.xadd(
+                stream,
+                {"t": ticker, "d": orjson.dumps(data)},
+                maxlen=STREAM_MAXLEN,
+                approximate=True
+            )
+        await pipe.execute()
+
+async def main():
+    tickers = TICKERS
+    # One keep-alive session for the agent's lifetime; DNS, TCP and TLS are reused every cycle
+    connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while True:
+            results = await asyncio.gather(
+                *(fetch_market_data(session, ticker) for ticker in tickers)
+            )
+            published = [(ticker, data) for ticker, data in zip(tickers, results) if data]
+            if published:
+                await publish_to_redis(REDIS_CHANNEL, published)
+                for ticker, _ in published:
+                    print(f"Published data for {ticker} to Redis stream {REDIS_CHANNEL}")
+            # Adjust sleep interval as needed
+            await asyncio.sleep(60)
 
 if __name__ == "__main__":
-    main()
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(main())
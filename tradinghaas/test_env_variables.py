@@ -1,14 +1,13 @@
-from dotenv import load_dotenv
-import os
+from config import load_env
 
 # Load .env file
-load_dotenv()
+env = load_env()
 
 # Fetch and print environment variables
-print("Polygon API Key:", os.getenv("POLYGON_API_KEY"))
-print("Redis Host:", os.getenv("REDIS_HOST"))
-print("Redis Port:", os.getenv("REDIS_PORT"))
-print("Redis Channel:", os.getenv("REDIS_CHANNEL"))
-print("S3 Bucket:", os.getenv("S3_BUCKET"))
-print("S3 Endpoint:", os.getenv("S3_ENDPOINT"))
+print("Polygon API Key:", env.get("POLYGON_API_KEY"))
+print("Redis Host:", env.get("REDIS_HOST"))
+print("Redis Port:", env.get("REDIS_PORT"))
+print("Redis Channel:", env.get("REDIS_CHANNEL"))
+print("S3 Bucket:", env.get("S3_BUCKET"))
+print("S3 Endpoint:", env.get("S3_ENDPOINT"))
 
@@ -1,36 +1,88 @@
-import os
-import redis
-import json
-from dotenv import load_dotenv
+import asyncio
+import redis.asyncio as redis
+import orjson
+from config import (
+    REDIS_CHANNEL, REDIS_CONSUMER, REDIS_CONSUMER_GROUP, REDIS_HOST, REDIS_PORT
+)
 
-# Load environment variables
-load_dotenv(dotenv_path="./.env")
+try:
+    import uvloop
+except ImportError:  # Windows or not installed: stock asyncio loop
+    uvloop = None
 
-# Redis Configuration
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_CHANNEL = os.getenv("REDIS_CHANNEL", "market-data")
+# Stream reads: up to BATCH_SIZE entries per call, blocking up to BLOCK_MS while idle
+BATCH_SIZE = 256
+BLOCK_MS = 1000
 
-# Connect to Redis
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+# Connect to Redis through a bounded pool (raw bytes payloads are parsed directly by orjson)
+redis_pool = redis.ConnectionPool.from_url(
+    f"redis://{REDIS_HOST}:{REDIS_PORT}", max_connections=16, decode_responses=False
+)
+redis_client = redis.Redis(connection_pool=redis_pool)
 
-def process_market_data(data):
+# Strong references to in-flight processing tasks
+pending_tasks = set()
+
+async def process_market_data(data):
     """
     Process incoming market data and implement trading logic.
     """
     print(f"Processing data: {data}")
     # Placeholder for actual trading logic
 
-def main():
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe(REDIS_CHANNEL)
+async def ensure_consumer_group():
+    """
+    Create the consumer group (and stream) on first run.
+    """
+    try:
+        await redis_client.xgroup_create(
+            REDIS_CHANNEL, REDIS_CONSUMER_GROUP, id="$", mkstream=True
+        )
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+async def process_market_data_batch(entries):
+    """
+    Parse and process a batch of stream entries, then acknowledge them together.
+    """
+    for _, fields in entries:
+        # A malformed entry is skipped rather than failing the rest of the batch
+        try:
+            data = orjson.loads(fields[b"d"])
+        except (KeyError, orjson.JSONDecodeError) as e:
+            print(f"Skipping malformed market data entry: {e}")
+            continue
+        await process_market_data(data)
+
+    await redis_client.xack(
+        REDIS_CHANNEL, REDIS_CONSUMER_GROUP, *(entry_id for entry_id, _ in entries)
+    )
+
+def dispatch_batch(entries):
+    """
+    Schedule a batch for processing without blocking the next stream read.
+    """
+    task = asyncio.create_task(process_market_data_batch(entries))
+    pending_tasks.add(task)
+    task.add_done_callback(pending_tasks.discard)
+
+async def main():
+    await ensure_consumer_group()
 
-    print(f"Subscribed to Redis channel {REDIS_CHANNEL}. Waiting for market data...")
+    print(f"Reading Redis stream {REDIS_CHANNEL} as {REDIS_CONSUMER_GROUP}/{REDIS_CONSUMER}. Waiting for market data...")
 
-    for message in pubsub.listen():
-        if message and message["type"] == "message":
-            data = json.loads(message["data"])
-            process_market_data(data)
+    while True:
+        # The server batches: one call returns everything new, up to BATCH_SIZE entries
+        response = await redis_client.xreadgroup(
+            REDIS_CONSUMER_GROUP, REDIS_CONSUMER, {REDIS_CHANNEL: ">"},
+            count=BATCH_SIZE, block=BLOCK_MS
+        )
+        for _, entries in response or ():
+            if entries:
+                dispatch_batch(entries)
 
 if __name__ == "__main__":
-    main()
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(main())